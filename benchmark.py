@@ -0,0 +1,219 @@
+# coding: utf-8
+"""
+Rough timings for performance sensitive parts of periodical.
+
+Usage:
+
+    python benchmark.py [aggregate] [floor] [parallel] [parse] [--size N]
+"""
+import calendar
+import collections
+import datetime
+import multiprocessing
+import random
+import re
+import sys
+import time
+
+import periodical
+
+
+def timed(label, func, *args):
+    started = time.time()
+    result = func(*args)
+    print('%-40s %8.3fs' % (label, time.time() - started))
+    return result
+
+
+# Parsing
+
+# The multi-regex parser that predates the single-pass tokenizer,
+# kept here as a baseline to compare against.
+legacy_res = [
+    ('yearly', re.compile('(?P<year>[0-9]+)$')),
+    ('quarterly', re.compile('(?P<year>[0-9]+)[-/][Qq](?P<quarter>[0-9]+)$')),
+    ('monthly', re.compile('(?P<year>[0-9]+)[-/](?P<month>[0-9]+)$')),
+    ('weekly', re.compile('(?P<year>[0-9]+)[-/][Ww](?P<week>[0-9]+)$')),
+    ('daily', re.compile('(?P<year>[0-9]+)[-/](?P<month>[0-9]+)[-/](?P<day>[0-9]+)$')),
+    ('hour', re.compile('(?P<year>[0-9]+)[-/](?P<month>[0-9]+)[-/](?P<day>[0-9]+)[T ](?P<hour>[0-9]+)$')),
+    ('minute', re.compile('(?P<year>[0-9]+)[-/](?P<month>[0-9]+)[-/](?P<day>[0-9]+)[T ](?P<hour>[0-9]+):(?P<minute>[0-9]+)$')),
+    ('second', re.compile('(?P<year>[0-9]+)[-/](?P<month>[0-9]+)[-/](?P<day>[0-9]+)[T ](?P<hour>[0-9]+):(?P<minute>[0-9]+):(?P<second>[0-9]+)$')),
+]
+
+
+def legacy_repr_to_time_and_span(string_repr):
+    if string_repr.endswith('Z'):
+        tzinfo = periodical.UTC()
+        string_repr = string_repr[:-1]
+    elif string_repr.endswith('+00:00') or string_repr.endswith('-00:00'):
+        tzinfo = periodical.UTC()
+        string_repr = string_repr[:-6]
+    elif periodical.timezone_re.match(string_repr[-6:]):
+        tzinfo = periodical.Offset(string_repr[-6:])
+        string_repr = string_repr[:-6]
+    else:
+        tzinfo = None
+
+    results = [(span, regex.match(string_repr)) for span, regex in legacy_res]
+    for span, result in results:
+        if result:
+            break
+    else:
+        raise ValueError('Unknown datetime representation')
+
+    fields = result.groupdict()
+    year = int(fields['year'])
+    if span == 'quarterly':
+        time = datetime.datetime(year, (int(fields['quarter']) * 3) - 2, 1)
+    elif span == 'weekly':
+        time = datetime.datetime(year, 1, 4) + datetime.timedelta(days=(int(fields['week']) * 7) - 7)
+    else:
+        time = datetime.datetime(
+            year, int(fields.get('month', 1)), int(fields.get('day', 1)),
+            int(fields.get('hour', 0)), int(fields.get('minute', 0)), int(fields.get('second', 0))
+        )
+    if tzinfo:
+        time = time.replace(tzinfo=tzinfo)
+    return (time, span)
+
+
+def mixed_time_reprs(size):
+    suffixes = ['', 'Z', '+01:00', '-05:00']
+    formats = [
+        '%Y', '%Y-Q{quarter}', '%Y-%m', '%Y-W{week:02d}', '%Y-%m-%d',
+        '%Y-%m-%dT%H', '%Y-%m-%dT%H:%M', '%Y-%m-%dT%H:%M:%S'
+    ]
+    start = datetime.datetime(2000, 1, 1)
+    rand = random.Random(0)
+    ret = []
+    for idx in range(size):
+        time = start + datetime.timedelta(seconds=rand.randint(0, 20 * 365 * 86400))
+        fmt = rand.choice(formats).format(quarter=(time.month + 2) // 3, week=time.isocalendar()[1])
+        ret.append(time.strftime(fmt) + rand.choice(suffixes))
+    return ret
+
+
+def bench_parse(size):
+    reprs = mixed_time_reprs(size)
+    legacy = timed('legacy multi-regex parser', lambda: [legacy_repr_to_time_and_span(r) for r in reprs])
+    tokenized = timed('single-pass tokenizer', lambda: [periodical._repr_to_time_and_span(r) for r in reprs])
+    assert legacy == tokenized
+    timed('parse_periods(kind="time")', periodical.parse_periods, reprs, 'time')
+
+
+# Aggregation
+
+def legacy_summation(periods, data_points):
+    # The sort and merge implementation of `map()` that predates
+    # the bucketing engine, kept here as a baseline to compare against.
+    is_descending = periods and (periods[0] > periods[-1])
+    date_value_iter = iter(sorted(data_points, key=lambda pair: pair[0], reverse=is_descending))
+    ret = collections.OrderedDict()
+    date, value = next(date_value_iter, (None, None))
+    for period in periods:
+        this_mapping = []
+        while date is not None and period.contains(date):
+            this_mapping.append(value)
+            date, value = next(date_value_iter, (None, None))
+        ret[period] = sum(this_mapping)
+    return ret
+
+
+def hourly_data_points(size, num_periods=24 * 31):
+    start = periodical.utc_datetime(2014, 1, 1)
+    rand = random.Random(0)
+    seconds = num_periods * 3600
+    return [
+        (start + datetime.timedelta(seconds=rand.randrange(seconds)), rand.randint(0, 100))
+        for idx in range(size)
+    ]
+
+
+def bench_aggregate(size):
+    periods = periodical.time_periods_ascending(periodical.utc_datetime(2014, 1, 1), 'hour', 24 * 31)
+    data_points = hourly_data_points(size)
+    legacy = timed('legacy sort and merge summation', legacy_summation, periods, data_points)
+    bucketed = timed('bucketed summation', periodical.summation, periods, data_points)
+    assert legacy == bucketed
+
+    # Compare against bucketing the same sorted list, since iterating
+    # over sorted data points has different memory locality.
+    sorted_points = sorted(data_points, key=lambda pair: pair[0])
+    timed('bucketed summation (sorted input)', periodical.summation, periods, sorted_points)
+    merged = timed('summation (assume_sorted=True)', periodical.aggregate, periods, sorted_points, periodical.Sum(), None, True)
+    assert legacy == merged
+
+    epoch_points = [(calendar.timegm(time.utctimetuple()), value) for time, value in data_points]
+    timed('datetimes from epoch timestamps', lambda: [
+        (periodical.utc_datetime(1970, 1, 1) + datetime.timedelta(seconds=seconds), value)
+        for seconds, value in epoch_points
+    ])
+    epoch = timed('epoch summation (unit="s")', periodical.summation, periods, epoch_points, 0, None, False, 's')
+    assert legacy == epoch
+
+    try:
+        import numpy
+    except ImportError:
+        return
+    times = numpy.array([periodical._naive_utc(time) for time, value in data_points], dtype='datetime64[us]')
+    values = numpy.array([value for time, value in data_points])
+    vectorized = timed('numpy_summation', periodical.numpy_summation, periods, times, values)
+    assert legacy == vectorized
+
+
+def bench_floor(size):
+    times = [time for time, value in hourly_data_points(size, 24 * 365)]
+    for span in ('hour', 'month'):
+        expected = timed('TimePeriod(time=t, span=%r).start' % span, lambda: [
+            periodical.TimePeriod(time=time, span=span).start for time in times
+        ])
+        floored = timed('floor_to_span(times, %r)' % span, periodical.floor_to_span, times, span)
+        assert expected == floored
+        epochs = [calendar.timegm(time.utctimetuple()) for time in times]
+        timed('floor_to_span(epochs, %r, unit="s")' % span, periodical.floor_to_span, epochs, span, None, 's')
+
+        try:
+            import numpy
+        except ImportError:
+            continue
+        array = numpy.array(epochs, dtype='datetime64[s]')
+        timed('floor_to_span(datetime64 array, %r)' % span, periodical.floor_to_span, array, span)
+
+
+def bench_parallel(size):
+    periods = periodical.time_periods_ascending(periodical.utc_datetime(2014, 1, 1), 'hour', 24 * 31)
+    data_points = hourly_data_points(size)
+    started = time.time()
+    serial = periodical.summation(periods, data_points)
+    serial_time = time.time() - started
+    print('%-40s %8.3fs' % ('summation', serial_time))
+    workers = 2
+    while workers <= max(multiprocessing.cpu_count(), 2):
+        started = time.time()
+        parallel = periodical.summation(periods, data_points, 0, workers)
+        elapsed = time.time() - started
+        # Worker startup dominates for small sizes, so this may be a slowdown.
+        print('%-40s %8.3fs  (%.2fx serial)' % ('summation(workers=%d)' % workers, elapsed, elapsed / serial_time))
+        assert serial == parallel
+        workers *= 2
+
+
+benchmarks = {
+    'aggregate': bench_aggregate,
+    'floor': bench_floor,
+    'parallel': bench_parallel,
+    'parse': bench_parse,
+}
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    size = 1000000
+    if '--size' in args:
+        idx = args.index('--size')
+        size = int(args[idx + 1])
+        del args[idx:idx + 2]
+    for name in args or sorted(benchmarks):
+        print('%s (size=%d)' % (name, size))
+        benchmarks[name](size)
+        print('')
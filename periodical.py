@@ -1,21 +1,44 @@
 # coding: utf-8
 
+import array
+import bisect
 import calendar
 import collections
 import datetime
+import hashlib
+import heapq
+import itertools
+import math
+import numbers
+import operator
 import re
-
-__version__ = '1.0.2'
-
-
-yearly_re = re.compile('(?P<year>[0-9]+)$')
-quarterly_re = re.compile('(?P<year>[0-9]+)[-/][Qq](?P<quarter>[0-9]+)$')
-monthly_re = re.compile('(?P<year>[0-9]+)[-/](?P<month>[0-9]+)$')
-weekly_re = re.compile('(?P<year>[0-9]+)[-/][Ww](?P<quarter>[0-9]+)$')
-daily_re = re.compile('(?P<year>[0-9]+)[-/](?P<month>[0-9]+)[-/](?P<day>[0-9]+)$')
-hour_re = re.compile('(?P<year>[0-9]+)[-/](?P<month>[0-9]+)[-/](?P<day>[0-9]+)[T ](?P<hour>[0-9]+)$')
-minute_re = re.compile('(?P<year>[0-9]+)[-/](?P<month>[0-9]+)[-/](?P<day>[0-9]+)[T ](?P<hour>[0-9]+):(?P<minute>[0-9]+)$')
-second_re = re.compile('(?P<year>[0-9]+)[-/](?P<month>[0-9]+)[-/](?P<day>[0-9]+)[T ](?P<hour>[0-9]+):(?P<minute>[0-9]+):(?P<second>[0-9]+)$')
+import sys
+import threading
+from collections.abc import Sequence
+
+__version__ = '2.0.0'
+
+
+# A period representation is tokenized by a single anchored regex, which
+# classifies the span from whichever optional groups matched.
+date_repr_re = re.compile(
+    '(?P<year>[0-9]+)'
+    '(?:[-/](?:'
+    '[Qq](?P<quarter>[0-9]+)|'
+    '[Ww](?P<week>[0-9]+)|'
+    '(?P<month>[0-9]+)(?:[-/](?P<day>[0-9]+))?'
+    '))?$'
+)
+time_repr_re = re.compile(
+    '(?P<year>[0-9]+)'
+    '(?:[-/](?:'
+    '[Qq](?P<quarter>[0-9]+)|'
+    '[Ww](?P<week>[0-9]+)|'
+    '(?P<month>[0-9]+)(?:[-/](?P<day>[0-9]+)'
+    '(?:[T ](?P<hour>[0-9]+)(?::(?P<minute>[0-9]+)(?::(?P<second>[0-9]+))?)?)?)?'
+    '))?'
+    '(?P<tz>Z|[+-][0-9][0-9]:[0-9][0-9])?$'
+)
 
 timezone_re = re.compile('(?P<sign>[+-])(?P<hours>[0-9][0-9]):(?P<minutes>[0-9][0-9])')
 
@@ -37,6 +60,11 @@ class UTC(datetime.tzinfo):
         return '<UTC>'
 
 
+# A shared instance, so that aware datetimes created by periodical can
+# usually be recognised as being in the same timezone with an `is` check.
+_utc = UTC()
+
+
 class Offset(datetime.tzinfo):
     """
     UTC timezone class.
@@ -49,6 +77,9 @@ class Offset(datetime.tzinfo):
         self._offset_repr = offset_repr
         self._offset = -offset if sign == '-' else offset
 
+    def __getinitargs__(self):
+        return (self._offset_repr,)
+
     def utcoffset(self, dt):
         return self._offset
 
@@ -73,27 +104,287 @@ def utcnow():
     """
     As `datetime.datetime.utcnow()`, but returns a timezone aware datetime in UTC.
     """
-    return datetime.datetime.utcnow().replace(tzinfo=UTC())
+    return datetime.datetime.utcnow().replace(tzinfo=_utc)
 
 
 def utc_datetime(*args, **kwargs):
     """
     As `datetime.datetime()`, but returns a timezone aware datetime in UTC.
     """
-    kwargs['tzinfo'] = UTC()
+    kwargs['tzinfo'] = _utc
     return datetime.datetime(*args, **kwargs)
 
 
-def _strip_hhmmss(time):
-    return time.replace(hour=0, minute=0, second=0, microsecond=0)
+_date_spans = {
+    'day': 'daily',
+    'dai': 'daily',
+    'wee': 'weekly',
+    'mon': 'monthly',
+    'qua': 'quarterly',
+    'yea': 'yearly'
+}
+
+_time_spans = dict(_date_spans, **{
+    'sec': 'seconds',
+    'min': 'minutes',
+    'hou': 'hours',
+})
+
+# Spans in order of increasing length, used when ordering periods.
+_span_order = {
+    'seconds': 0,
+    'minutes': 1,
+    'hours': 2,
+    'daily': 3,
+    'weekly': 4,
+    'monthly': 5,
+    'quarterly': 6,
+    'yearly': 7,
+}
+
+# The length of each fixed width time span, in seconds.
+_span_seconds = {
+    'seconds': 1,
+    'minutes': 60,
+    'hours': 3600,
+}
+
+# The number of units in a second, for each unit of epoch timestamps.
+_epoch_units = {
+    's': 1,
+    'ms': 1000,
+    'us': 1000000,
+    'ns': 1000000000,
+}
+
+
+def _normalize_span(span, spans):
+    """
+    Given a span argument such as 'month' or 'Monthly', return the
+    canonical span name, from the given span lookup table.
+    """
+    try:
+        return spans[span.lower()[:3]]
+    except (KeyError, AttributeError):
+        raise ValueError("Invalid value for `span` argument '%s'" % span)
+
+
+# Span ordinals
+#
+# Each period is numbered by an integer ordinal within its span:
+#
+# * daily     - The proleptic Gregorian ordinal, as `date.toordinal()`.
+# * weekly    - ISO weeks since the week starting 0001-01-01, which is a Monday.
+# * monthly   - `year * 12 + month - 1`.
+# * quarterly - `year * 4 + quarter - 1`.
+# * yearly    - The year.
+# * seconds, minutes, hours - The number of whole spans since the start of the
+#   proleptic Gregorian day zero, so that eg. `hour_ordinal // 24 == day_ordinal`.
+#
+# Time period ordinals are based on the wall clock time of the period,
+# ignoring any timezone information.
+
+def _seconds_ordinal(time):
+    return (time.toordinal() * 86400) + (time.hour * 3600) + (time.minute * 60) + time.second
+
+
+def _minutes_ordinal(time):
+    return (time.toordinal() * 1440) + (time.hour * 60) + time.minute
+
+
+def _hours_ordinal(time):
+    return (time.toordinal() * 24) + time.hour
+
+
+def _daily_ordinal(date):
+    return date.toordinal()
+
+
+def _weekly_ordinal(date):
+    return (date.toordinal() - 1) // 7
+
+
+def _monthly_ordinal(date):
+    return (date.year * 12) + date.month - 1
+
+
+def _quarterly_ordinal(date):
+    return (date.year * 4) + ((date.month - 1) // 3)
+
+
+def _yearly_ordinal(date):
+    return date.year
+
+
+# Functions that floor a date or datetime to the ordinal
+# of the containing period, for each span.
+_ordinal_funcs = {
+    'seconds': _seconds_ordinal,
+    'minutes': _minutes_ordinal,
+    'hours': _hours_ordinal,
+    'daily': _daily_ordinal,
+    'weekly': _weekly_ordinal,
+    'monthly': _monthly_ordinal,
+    'quarterly': _quarterly_ordinal,
+    'yearly': _yearly_ordinal,
+}
+
+
+def _date_to_ordinal(span, date):
+    """
+    Return the ordinal of the date period with the given span
+    that contains the given date or datetime.
+    """
+    return _ordinal_funcs[span](date)
+
+
+def _time_to_ordinal(span, time):
+    """
+    Return the ordinal of the time period with the given span
+    that contains the given datetime.
+    """
+    return _ordinal_funcs[span](time)
+
+
+def _to_timezone(time, tzinfo):
+    """
+    Return an aware datetime converted to the given timezone, unless it
+    already uses the same offset. Naive datetimes are returned unchanged.
+    """
+    time_tzinfo = time.tzinfo
+    if time_tzinfo is tzinfo or time_tzinfo is None or tzinfo is None:
+        return time
+    elif time.utcoffset() == tzinfo.utcoffset(time):
+        return time
+    return time.astimezone(tzinfo)
+
+
+def _floor_func(span, tzinfo=None):
+    """
+    Return a function that floors a date or time to the ordinal of the
+    containing period with the given canonical span and timezone.
+    """
+    to_ordinal = _ordinal_funcs[span]
+    if tzinfo is None:
+        return to_ordinal
+
+    def floor(time):
+        time_tzinfo = time.tzinfo
+        if time_tzinfo is not tzinfo and time_tzinfo is not None and time.utcoffset() != tzinfo.utcoffset(time):
+            time = time.astimezone(tzinfo)
+        return to_ordinal(time)
+    return floor
+
+
+def _ordinal_to_date(span, ordinal):
+    """
+    Return the first date of the date period with the given span and ordinal.
+    """
+    if span == 'daily':
+        return datetime.date.fromordinal(ordinal)
+    elif span == 'weekly':
+        return datetime.date.fromordinal((ordinal * 7) + 1)
+    elif span == 'monthly':
+        year, month = divmod(ordinal, 12)
+        return datetime.date(year, month + 1, 1)
+    elif span == 'quarterly':
+        year, quarter = divmod(ordinal, 4)
+        return datetime.date(year, (quarter * 3) + 1, 1)
+    else:  # span == 'yearly'
+        return datetime.date(ordinal, 1, 1)
+
+
+def _ordinal_to_date_range(span, ordinal):
+    """
+    Return a two-tuple of the first and last dates of the date period
+    with the given span and ordinal.
+    """
+    start = _ordinal_to_date(span, ordinal)
+    if span == 'daily':
+        return (start, start)
+    return (start, _ordinal_to_date(span, ordinal + 1) - datetime.timedelta(days=1))
+
+
+def _ordinal_to_time(span, ordinal, tzinfo=None):
+    """
+    Return the start time of the time period with the given span and ordinal.
+    """
+    try:
+        width = _span_seconds[span]
+    except KeyError:
+        date = _ordinal_to_date(span, ordinal)
+        return datetime.datetime(date.year, date.month, date.day, tzinfo=tzinfo)
+    days, seconds = divmod(ordinal * width, 86400)
+    date = datetime.date.fromordinal(days)
+    return datetime.datetime(
+        date.year, date.month, date.day,
+        seconds // 3600, (seconds // 60) % 60, seconds % 60, tzinfo=tzinfo
+    )
+
+
+_tzinfo_cache = {}
+
+
+def _repr_to_tzinfo(tz_repr):
+    """
+    Given a timezone suffix, such as 'Z' or '-05:00', return a tzinfo instance.
 
+    Instances are shared between calls, so that parsing many representations
+    does not re-run the offset regex for every string.
+    """
+    try:
+        return _tzinfo_cache[tz_repr]
+    except KeyError:
+        pass
+    if tz_repr in ('Z', '+00:00', '-00:00'):
+        tzinfo = _utc
+    else:
+        tzinfo = Offset(tz_repr)
+    _tzinfo_cache[tz_repr] = tzinfo
+    return tzinfo
 
-def _incr_month(month, amount=1):
-    return ((month + amount) % 12) or 12
 
+def _repr_to_fields(string_repr, is_time):
+    """
+    Tokenize a period representation in a single pass, returning a three-tuple
+    of the span, the numeric fields, and the timezone suffix, if any.
 
-def _decr_month(month, amount=1):
-    return ((month - amount) % 12) or 12
+    eg. '2001-Q2' -> ('quarterly', (2001, 4, 1, 0, 0, 0), None)
+    """
+    if is_time:
+        result = time_repr_re.match(string_repr)
+        if result is None:
+            return None
+        year, quarter, week, month, day, hour, minute, second, tz_repr = result.groups()
+    else:
+        result = date_repr_re.match(string_repr)
+        if result is None:
+            return None
+        year, quarter, week, month, day = result.groups()
+        hour = tz_repr = None
+
+    year = int(year)
+    if quarter is not None:
+        return ('quarterly', (year, (int(quarter) * 3) - 2, 1, 0, 0, 0), tz_repr)
+    elif week is not None:
+        return ('weekly', (year, int(week)), tz_repr)
+    elif month is None:
+        return ('yearly', (year, 1, 1, 0, 0, 0), tz_repr)
+    elif day is None:
+        return ('monthly', (year, int(month), 1, 0, 0, 0), tz_repr)
+    elif hour is None:
+        return ('daily', (year, int(month), int(day), 0, 0, 0), tz_repr)
+    elif minute is None:
+        return ('hour', (year, int(month), int(day), int(hour), 0, 0), tz_repr)
+    elif second is None:
+        return ('minute', (year, int(month), int(day), int(hour), int(minute), 0), tz_repr)
+    return ('second', (year, int(month), int(day), int(hour), int(minute), int(second)), tz_repr)
+
+
+def _iso_week_date(year, week):
+    # ISO 8601 dates always include 4th Jan in the first week.
+    # We populate a date that will be in the correct week period.
+    return datetime.date(year, 1, 4) + datetime.timedelta(days=(week * 7) - 7)
 
 
 def _repr_to_date_and_span(string_repr):
@@ -101,116 +392,38 @@ def _repr_to_date_and_span(string_repr):
     Given a date period representation, return a two-tuple of the
     corresponding start date and string time span.
 
-    eg. '2001-04' -> (date(2001, 04, 01), 'daily')
-    """
-    yearly_result = yearly_re.match(string_repr)
-    quarerly_result = quarterly_re.match(string_repr)
-    monthly_result = monthly_re.match(string_repr)
-    weekly_result = weekly_re.match(string_repr)
-    daily_result = daily_re.match(string_repr)
-
-    if yearly_result:
-        (year,) = yearly_result.groups()
-        date = datetime.date(int(year), 1, 1)
-        span = 'yearly'
-    elif quarerly_result:
-        (year, quarter) = quarerly_result.groups()
-        date = datetime.date(int(year), (int(quarter) * 3) - 2, 1)
-        span = 'quarterly'
-    elif monthly_result:
-        (year, month) = monthly_result.groups()
-        date = datetime.date(int(year), int(month), 1)
-        span = 'monthly'
-    elif weekly_result:
-        # ISO 8601 dates always include 4th Jan in the first week.
-        # We populate a date that will be in the correct week period.
-        (year, week) = weekly_result.groups()
-        date = (
-            datetime.date(int(year), 1, 4) +
-            datetime.timedelta(days=(int(week) * 7) - 7)
-        )
-        span = 'weekly'
-    elif daily_result:
-        (year, month, day) = daily_result.groups()
-        date = datetime.date(int(year), int(month), int(day))
-        span = 'daily'
-    else:
+    eg. '2001-04' -> (date(2001, 04, 01), 'monthly')
+    """
+    parsed = _repr_to_fields(string_repr, False)
+    if parsed is None:
         raise ValueError('Unknown date representation')
 
+    span, fields, tz_repr = parsed
+    if span == 'weekly':
+        date = _iso_week_date(*fields)
+    else:
+        date = datetime.date(*fields[:3])
     return (date, span)
 
 
 def _repr_to_time_and_span(string_repr):
     """
     Given a time period representation, return a two-tuple of the
-    corresponding start date and string time span.
+    corresponding start time and string time span.
 
-    eg. '2001-04' -> (datetime(2001, 04, 01), 'daily')
-    """
-    if string_repr.endswith('Z'):
-        tzinfo = UTC()
-        string_repr = string_repr[:-1]
-    elif string_repr.endswith('+00:00') or string_repr.endswith('-00:00'):
-        tzinfo = UTC()
-        string_repr = string_repr[:-6]
-    elif timezone_re.match(string_repr[-6:]):
-        tzinfo = Offset(string_repr[-6:])
-        string_repr = string_repr[:-6]
-    else:
-        tzinfo = None
-
-    yearly_result = yearly_re.match(string_repr)
-    quarerly_result = quarterly_re.match(string_repr)
-    monthly_result = monthly_re.match(string_repr)
-    weekly_result = weekly_re.match(string_repr)
-    daily_result = daily_re.match(string_repr)
-    hour_result = hour_re.match(string_repr)
-    minute_result = minute_re.match(string_repr)
-    second_result = second_re.match(string_repr)
-
-    if yearly_result:
-        (year,) = yearly_result.groups()
-        time = datetime.datetime(int(year), 1, 1)
-        span = 'yearly'
-    elif quarerly_result:
-        (year, quarter) = quarerly_result.groups()
-        time = datetime.datetime(int(year), (int(quarter) * 3) - 2, 1)
-        span = 'quarterly'
-    elif monthly_result:
-        (year, month) = monthly_result.groups()
-        time = datetime.datetime(int(year), int(month), 1)
-        span = 'monthly'
-    elif weekly_result:
-        # ISO 8601 dates always include 4th Jan in the first week.
-        # We populate a date that will be in the correct week period.
-        (year, week) = weekly_result.groups()
-        time = (
-            datetime.datetime(int(year), 1, 4) +
-            datetime.timedelta(days=(int(week) * 7) - 7)
-        )
-        span = 'weekly'
-    elif daily_result:
-        (year, month, day) = daily_result.groups()
-        time = datetime.datetime(int(year), int(month), int(day))
-        span = 'daily'
-    elif hour_result:
-        (year, month, day, hour) = hour_result.groups()
-        time = datetime.datetime(int(year), int(month), int(day), int(hour))
-        span = 'hour'
-    elif minute_result:
-        (year, month, day, hour, minute) = minute_result.groups()
-        time = datetime.datetime(int(year), int(month), int(day), int(hour), int(minute))
-        span = 'minute'
-    elif second_result:
-        (year, month, day, hour, minute, second) = second_result.groups()
-        time = datetime.datetime(int(year), int(month), int(day), int(hour), int(minute), int(second))
-        span = 'second'
-    else:
+    eg. '2001-04' -> (datetime(2001, 04, 01), 'monthly')
+    """
+    parsed = _repr_to_fields(string_repr, True)
+    if parsed is None:
         raise ValueError('Unknown datetime representation')
 
-    if tzinfo:
-        time = time.replace(tzinfo=tzinfo)
-
+    span, fields, tz_repr = parsed
+    tzinfo = None if tz_repr is None else _repr_to_tzinfo(tz_repr)
+    if span == 'weekly':
+        date = _iso_week_date(*fields)
+        time = datetime.datetime(date.year, date.month, date.day, tzinfo=tzinfo)
+    else:
+        time = datetime.datetime(*fields, tzinfo=tzinfo)
     return (time, span)
 
 
@@ -219,12 +432,14 @@ class DatePeriod(object):
     An immuntable object that represents a calendering period,
     which may be one of: daily, weekly, monthly, quarterly, yearly.
     """
-    def __init__(self, string_repr=None, date=None, span=None, _start=None, _end=None, _today_func=None):
-        self.today_func = utctoday if _today_func is None else _today_func
+    __slots__ = ('_span', '_start', '_end', '_hash')
+
+    # The clock used when no date is supplied is shared by all instances.
+    today_func = staticmethod(utctoday)
 
+    def __init__(self, string_repr=None, date=None, span=None, _start=None, _end=None, _today_func=None):
         if _start is not None and _end is not None:
-            # Created a new DatePeriod with explicit start and end dates,
-            # as a result of calling `.previous()` or `.next()`.
+            # Create a new period with explicit start and end dates.
             self._span = span
             self._start = _start
             self._end = _end
@@ -240,107 +455,80 @@ class DatePeriod(object):
         assert span is not None, '`span` argument not supplied.'
 
         if date is None:
-            date = self.today_func()
+            date = self.today_func() if _today_func is None else _today_func()
 
-        try:
-            self._span = {
-                'day': 'daily',
-                'dai': 'daily',
-                'wee': 'weekly',
-                'mon': 'monthly',
-                'qua': 'quarterly',
-                'yea': 'yearly'
-            }[span.lower()[:3]]
-        except KeyError:
-            raise ValueError("Invalid value for `span` argument '%s'" % span)
-
-        if self._span == 'daily':
-            self._start = date
-            self._end = date
-        elif self._span == 'weekly':
-            weekday = date.weekday()  # 0..6
-            self._start = date - datetime.timedelta(days=weekday)
-            self._end = date + datetime.timedelta(days=(6 - weekday))
-        elif self._span == 'monthly':
-            month_end_day = calendar.monthrange(date.year, date.month)[1]
-            self._start = datetime.date(date.year, date.month, 1)
-            self._end = datetime.date(date.year, date.month, month_end_day)
-        elif self._span == 'quarterly':
-            current_quarter = int((date.month - 1) / 3)  # In the range 0..3
-            st_month = (current_quarter * 3) + 1   # (1, 4, 7, 10)
-            en_month = (current_quarter * 3) + 3   # (3, 6, 9, 12)
-            month_end_day = calendar.monthrange(date.year, en_month)[1]
-            self._start = datetime.date(date.year, st_month, 1)
-            self._end = datetime.date(date.year, en_month, month_end_day)
-        else:  # self._span == 'yearly':
-            self._start = datetime.date(date.year, 1, 1)
-            self._end = datetime.date(date.year, 12, 31)
+        self._span = _normalize_span(span, _date_spans)
+        ordinal = _date_to_ordinal(self._span, date)
+        self._start, self._end = _ordinal_to_date_range(self._span, ordinal)
+
+    @classmethod
+    def from_ordinal(cls, span, ordinal):
+        """
+        Return the DatePeriod with the given span and integer ordinal.
+        """
+        return cls._from_ordinal(_normalize_span(span, _date_spans), ordinal)
+
+    @classmethod
+    def _from_ordinal(cls, span, ordinal, tzinfo=None):
+        # As `from_ordinal()`, but takes a canonical span, and skips `__init__`.
+        # The `tzinfo` argument is ignored, and is accepted so that date and
+        # time periods may be built in the same way.
+        period = cls.__new__(cls)
+        period._span = span
+        period._start, period._end = _ordinal_to_date_range(span, ordinal)
+        return period
+
+    @classmethod
+    def _floor_ordinal(cls, span, date, tzinfo=None):
+        # Return the ordinal of the period with the given canonical span
+        # that contains the given date.
+        return _date_to_ordinal(span, date)
+
+    @property
+    def ordinal(self):
+        """
+        Return an integer that numbers this period within its span.
+        """
+        return _date_to_ordinal(self._span, self._start)
 
     def previous(self):
         """
         Return a new DatePeriod representing the period
         immediately prior to this one.
         """
-        if self.span == 'daily':
-            start = self.start - datetime.timedelta(days=1)
-            end = self.end - datetime.timedelta(days=1)
-        elif self.span == 'weekly':
-            start = self.start - datetime.timedelta(days=7)
-            end = self.end - datetime.timedelta(days=7)
-        elif self.span == 'monthly':
-            year = self.start.year - 1 if self.start.month == 1 else self.start.year
-            start_month = _decr_month(self.start.month)
-            end_month = _decr_month(self.end.month)
-            end_day = calendar.monthrange(year, end_month)[1]
-            start = self.start.replace(month=start_month, year=year)
-            end = self.end.replace(day=end_day, month=end_month, year=year)
-        elif self._span == 'quarterly':
-            year = self._start.year
-            if self._start.month == 1:
-                year -= 1
-            start_month = _decr_month(self.start.month, 3)
-            end_month = _decr_month(self.end.month, 3)
-            end_day = calendar.monthrange(year, end_month)[1]
-            start = self.start.replace(month=start_month, year=year)
-            end = self.end.replace(day=end_day, month=end_month, year=year)
-        else:  # self._span == 'yearly'
-            year = self.start.year - 1
-            start = self.start.replace(year)
-            end = self.end.replace(year)
-
-        return DatePeriod(span=self.span, _start=start, _end=end)
+        return self - 1
 
     def next(self):
         """
         Return a new DatePeriod representing the period
         immediately following this one.
         """
-        if self.span == 'daily':
-            start = self.start + datetime.timedelta(days=1)
-            end = self.end + datetime.timedelta(days=1)
-        elif self.span == 'weekly':
-            start = self.start + datetime.timedelta(days=7)
-            end = self.end + datetime.timedelta(days=7)
-        elif self.span == 'monthly':
-            year = self.start.year + 1 if self.start.month == 12 else self.start.year
-            start_month = _incr_month(self.start.month)
-            end_month = _incr_month(self.end.month)
-            end_day = calendar.monthrange(year, end_month)[1]
-            start = self.start.replace(month=start_month, year=year)
-            end = self.end.replace(day=end_day, month=end_month, year=year)
-        elif self._span == 'quarterly':
-            year = self.start.year + 1 if self.start.month >= 10 else self.start.year
-            start_month = _incr_month(self.start.month, 3)
-            end_month = _incr_month(self.end.month, 3)
-            end_day = calendar.monthrange(year, end_month)[1]
-            start = self.start.replace(month=start_month, year=year)
-            end = self.end.replace(day=end_day, month=end_month, year=year)
-        else:  # self._span == 'yearly'
-            year = self.start.year + 1
-            start = self.start.replace(year)
-            end = self.end.replace(year)
-
-        return DatePeriod(span=self.span, _start=start, _end=end)
+        return self + 1
+
+    def __add__(self, other):
+        """
+        Return the DatePeriod that is the given number of periods after this one.
+        """
+        if not isinstance(other, numbers.Integral):
+            return NotImplemented
+        return self._from_ordinal(self._span, self.ordinal + other)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        """
+        Given an integer, return the DatePeriod that is the given number of
+        periods before this one.
+
+        Given another DatePeriod, return the number of periods between the two.
+        """
+        if isinstance(other, numbers.Integral):
+            return self._from_ordinal(self._span, self.ordinal - other)
+        elif isinstance(other, DatePeriod):
+            if self._span != other._span:
+                raise ValueError('Cannot subtract periods with different spans')
+            return self.ordinal - other.ordinal
+        return NotImplemented
 
     def isoformat(self):
         """
@@ -350,7 +538,7 @@ class DatePeriod(object):
             # YYYY-MM-DD
             return self.start.isoformat()
         elif self.span == 'weekly':
-            # YYYY-W##
+            # YYYY-W##
             iso_year, iso_week, iso_day = self.start.isocalendar()
             return '%d-W%02d' % (iso_year, iso_week)
         elif self.span in ('monthly', 'quarterly'):
@@ -360,10 +548,16 @@ class DatePeriod(object):
             # YYYY
             return str(self.start.year)
 
-    def contains(self, date):
+    def contains(self, date, unit=None):
         """
         Returns `True` if the given date is contained by this period.
+
+        If `unit` is given, the date is an epoch timestamp in that unit,
+        one of 's', 'ms', 'us' or 'ns', and the period is treated as UTC.
         """
+        if unit is not None:
+            start, end = _epoch_bounds(self, _epoch_scale(unit))
+            return date >= start and date < end
         return date >= self.start and date <= self.end
 
     def __repr__(self):
@@ -377,11 +571,19 @@ class DatePeriod(object):
         Returns a representation that uniquely identifies the date period.
         """
         if self.span == 'quarterly':
-            return "%04d-Q%01d" % (self.start.year, (self.end.month / 3))
+            return "%04d-Q%01d" % (self.start.year, (self.start.month + 2) // 3)
         return self.isoformat()
 
     def __hash__(self):
-        return hash(str(self))
+        try:
+            return self._hash
+        except AttributeError:
+            self._hash = hash((self._span, self._start))
+            return self._hash
+
+    def __reduce__(self):
+        # The cached hash is not pickled, as it may differ between processes.
+        return (self.__class__, (None, None, self._span, self._start, self._end))
 
     @property
     def start(self):
@@ -395,13 +597,42 @@ class DatePeriod(object):
     def span(self):
         return self._span
 
-    def __gt__(self, other):
-        return self.start > other.end
-
+    # Periods are ordered by span, and then by start.
     def __eq__(self, other):
         if not isinstance(other, DatePeriod):
             return False
-        return self.start == other.start and self.end == other.end
+        return self._span == other._span and self._start == other._start
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __lt__(self, other):
+        if not isinstance(other, DatePeriod):
+            return NotImplemented
+        if self._span == other._span:
+            return self._start < other._start
+        return _span_order[self._span] < _span_order[other._span]
+
+    def __le__(self, other):
+        if not isinstance(other, DatePeriod):
+            return NotImplemented
+        if self._span == other._span:
+            return self._start <= other._start
+        return _span_order[self._span] < _span_order[other._span]
+
+    def __gt__(self, other):
+        if not isinstance(other, DatePeriod):
+            return NotImplemented
+        if self._span == other._span:
+            return self._start > other._start
+        return _span_order[self._span] > _span_order[other._span]
+
+    def __ge__(self, other):
+        if not isinstance(other, DatePeriod):
+            return NotImplemented
+        if self._span == other._span:
+            return self._start >= other._start
+        return _span_order[self._span] > _span_order[other._span]
 
 
 class TimePeriod(object):
@@ -409,12 +640,14 @@ class TimePeriod(object):
     An immuntable object that represents a calendering period,
     which may be one of: daily, weekly, monthly, quarterly, yearly.
     """
-    def __init__(self, string_repr=None, time=None, span=None, _start=None, _end=None, _now_func=None):
-        self.now_func = utcnow if _now_func is None else _now_func
+    __slots__ = ('_span', '_start', '_end', '_hash')
+
+    # The clock used when no time is supplied is shared by all instances.
+    now_func = staticmethod(utcnow)
 
+    def __init__(self, string_repr=None, time=None, span=None, _start=None, _end=None, _now_func=None):
         if _start is not None and _end is not None:
-            # Created a new DatePeriod with explicit start and end dates,
-            # as a result of calling `.previous()` or `.next()`.
+            # Create a new period with explicit start and end dates.
             self._span = span
             self._start = _start
             self._end = _end
@@ -430,134 +663,83 @@ class TimePeriod(object):
         assert span is not None, '`span` argument not supplied.'
 
         if time is None:
-            time = self.now_func()
+            time = self.now_func() if _now_func is None else _now_func()
 
-        try:
-            self._span = {
-                'sec': 'seconds',
-                'min': 'minutes',
-                'hou': 'hours',
-                'day': 'daily',
-                'dai': 'daily',
-                'wee': 'weekly',
-                'mon': 'monthly',
-                'qua': 'quarterly',
-                'yea': 'yearly'
-            }[span.lower()[:3]]
-        except KeyError:
-            raise ValueError("Invalid value for `span` argument '%s'" % span)
-
-        if self._span == 'seconds':
-            self._start = time.replace(microsecond=0)
-            self._end = time + datetime.timedelta(seconds=1)
-        elif self._span == 'minutes':
-            self._start = time.replace(second=0, microsecond=0)
-            self._end = time.replace(second=0) + datetime.timedelta(minutes=1)
-        elif self._span == 'hours':
-            self._start = time.replace(minute=0, second=0, microsecond=0)
-            self._end = time.replace(minute=0, second=0) + datetime.timedelta(hours=1)
-        elif self._span == 'daily':
-            self._start = _strip_hhmmss(time)
-            self._end = _strip_hhmmss(time) + datetime.timedelta(days=1)
-        elif self._span == 'weekly':
-            weekday = time.weekday()  # 0..6
-            self._start = _strip_hhmmss(time) - datetime.timedelta(days=weekday)
-            self._end = _strip_hhmmss(time) + datetime.timedelta(days=(7 - weekday))
-        elif self._span == 'monthly':
-            en_month = _incr_month(time.month)
-            en_year = time.year + 1 if time.month == 12 else time.year
-            self._start = _strip_hhmmss(time).replace(day=1)
-            self._end = _strip_hhmmss(time).replace(year=en_year, month=en_month, day=1)
-        elif self._span == 'quarterly':
-            current_quarter = int((time.month - 1) / 3)  # In the range 0..3
-            st_month = (current_quarter * 3) + 1               # (1, 4, 7, 10)
-            en_month = _incr_month((current_quarter * 3), 4)   # (4, 7, 10, 1)
-            en_year = time.year + 1 if current_quarter == 3 else time.year
-            self._start = _strip_hhmmss(time).replace(month=st_month, day=1)
-            self._end = _strip_hhmmss(time).replace(year=en_year, month=en_month, day=1)
-        else:  # self._span == 'yearly':
-            self._start = _strip_hhmmss(time).replace(month=1, day=1)
-            self._end = _strip_hhmmss(time).replace(year=time.year + 1, month=1, day=1)
+        self._span = _normalize_span(span, _time_spans)
+        ordinal = _time_to_ordinal(self._span, time)
+        self._start = _ordinal_to_time(self._span, ordinal, time.tzinfo)
+        self._end = _ordinal_to_time(self._span, ordinal + 1, time.tzinfo)
+
+    @classmethod
+    def from_ordinal(cls, span, ordinal, tzinfo=None):
+        """
+        Return the TimePeriod with the given span and integer ordinal,
+        using the given timezone info.
+        """
+        return cls._from_ordinal(_normalize_span(span, _time_spans), ordinal, tzinfo)
+
+    @classmethod
+    def _from_ordinal(cls, span, ordinal, tzinfo):
+        # As `from_ordinal()`, but takes a canonical span, and skips `__init__`.
+        period = cls.__new__(cls)
+        period._span = span
+        period._start = _ordinal_to_time(span, ordinal, tzinfo)
+        period._end = _ordinal_to_time(span, ordinal + 1, tzinfo)
+        return period
+
+    @classmethod
+    def _floor_ordinal(cls, span, time, tzinfo=None):
+        # Return the ordinal of the period with the given canonical span
+        # and timezone that contains the given time.
+        return _time_to_ordinal(span, _to_timezone(time, tzinfo))
+
+    @property
+    def ordinal(self):
+        """
+        Return an integer that numbers this period within its span.
+        """
+        return _time_to_ordinal(self._span, self._start)
 
     def previous(self):
         """
         Return a new TimePeriod representing the period
         immediately prior to this one.
         """
-        if self.span == 'seconds':
-            start = self.start - datetime.timedelta(seconds=1)
-            end = self.end - datetime.timedelta(seconds=1)
-        elif self.span == 'minutes':
-            start = self.start - datetime.timedelta(minutes=1)
-            end = self.end - datetime.timedelta(minutes=1)
-        elif self.span == 'hours':
-            start = self.start - datetime.timedelta(hours=1)
-            end = self.end - datetime.timedelta(hours=1)
-        elif self.span == 'daily':
-            start = self.start - datetime.timedelta(days=1)
-            end = self.end - datetime.timedelta(days=1)
-        elif self.span == 'weekly':
-            start = self.start - datetime.timedelta(days=7)
-            end = self.end - datetime.timedelta(days=7)
-        elif self.span == 'monthly':
-            start_year = self.start.year - 1 if self.start.month == 1 else self.start.year
-            end_year = self.end.year - 1 if self.end.month == 1 else self.end.year
-            start_month = _decr_month(self.start.month)
-            end_month = _decr_month(self.end.month)
-            start = self._start.replace(month=start_month, year=start_year)
-            end = self._end.replace(month=end_month, year=end_year)
-        elif self.span == 'quarterly':
-            start_year = self.start.year - 1 if self.start.month == 1 else self.start.year
-            end_year = self.end.year - 1 if self.end.month == 1 else self.end.year
-            start_month = _decr_month(self.start.month, 3)
-            end_month = _decr_month(self.end.month, 3)
-            start = self._start.replace(month=start_month, year=start_year)
-            end = self._end.replace(month=end_month, year=end_year)
-        else:  # self._span == 'yearly'
-            start = self.start.replace(self.start.year - 1)
-            end = self.end.replace(self.end.year - 1)
-
-        return TimePeriod(span=self.span, _start=start, _end=end)
+        return self - 1
 
     def next(self):
         """
         Return a new TimePeriod representing the period
         immediately following this one.
         """
-        if self._span == 'seconds':
-            start = self.start + datetime.timedelta(seconds=1)
-            end = self.end + datetime.timedelta(seconds=1)
-        elif self._span == 'minutes':
-            start = self.start + datetime.timedelta(minutes=1)
-            end = self.end + datetime.timedelta(minutes=1)
-        elif self._span == 'hours':
-            start = self.start + datetime.timedelta(hours=1)
-            end = self.end + datetime.timedelta(hours=1)
-        elif self._span == 'daily':
-            start = self.start + datetime.timedelta(days=1)
-            end = self.end + datetime.timedelta(days=1)
-        elif self._span == 'weekly':
-            start = self.start + datetime.timedelta(days=7)
-            end = self.end + datetime.timedelta(days=7)
-        elif self._span == 'monthly':
-            start_year = self.start.year + 1 if self.start.month == 12 else self.start.year
-            end_year = self.end.year + 1 if self.end.month == 12 else self.end.year
-            start_month = _incr_month(self.start.month)
-            end_month = _incr_month(self.end.month)
-            start = self.start.replace(year=start_year, month=start_month)
-            end = self.end.replace(year=end_year, month=end_month)
-        elif self._span == 'quarterly':
-            start_year = self.start.year + 1 if self.start.month >= 10 else self.start.year
-            end_year = self.end.year + 1 if self.end.month >= 10 else self.end.year
-            start_month = _incr_month(self._start.month, 3)
-            end_month = _incr_month(self._end.month, 3)
-            start = self.start.replace(year=start_year, month=start_month)
-            end = self.end.replace(year=end_year, month=end_month)
-        else:  # self._span == 'yearly'
-            start = self.start.replace(self.start.year + 1)
-            end = self.end.replace(self.end.year + 1)
-
-        return TimePeriod(span=self.span, _start=start, _end=end)
+        return self + 1
+
+    def __add__(self, other):
+        """
+        Return the TimePeriod that is the given number of periods after this one.
+        """
+        if not isinstance(other, numbers.Integral):
+            return NotImplemented
+        return self._from_ordinal(self._span, self.ordinal + other, self._start.tzinfo)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        """
+        Given an integer, return the TimePeriod that is the given number of
+        periods before this one.
+
+        Given another TimePeriod, return the number of periods between the two.
+        """
+        if isinstance(other, numbers.Integral):
+            return self._from_ordinal(self._span, self.ordinal - other, self._start.tzinfo)
+        elif isinstance(other, TimePeriod):
+            if self._span != other._span:
+                raise ValueError('Cannot subtract periods with different spans')
+            if self._start.utcoffset() != other._start.utcoffset():
+                raise ValueError('Cannot subtract periods with different timezones')
+            return self.ordinal - other.ordinal
+        return NotImplemented
 
     def isoformat(self):
         """
@@ -583,18 +765,28 @@ class TimePeriod(object):
             # YYYY
             ret = str(self.start.year)
 
-        if self.start.tzinfo is not None:
-            if self.start.utcoffset().seconds:
-                ret += self.start.isoformat()[-6:]
-            else:
-                ret += 'Z'
+        return ret + self._tz_suffix()
 
-        return ret
+    def _tz_suffix(self):
+        """
+        Return the 'Z' or '+HH:MM' suffix for the period's timezone, if any.
+        """
+        if self.start.tzinfo is None:
+            return ''
+        elif self.start.utcoffset().seconds:
+            return self.start.isoformat()[-6:]
+        return 'Z'
 
-    def contains(self, time):
+    def contains(self, time, unit=None):
         """
         Returns `True` if the given datetime is contained by this period.
+
+        If `unit` is given, the time is an epoch timestamp in that unit,
+        one of 's', 'ms', 'us' or 'ns'. Naive periods are treated as UTC.
         """
+        if unit is not None:
+            start, end = _epoch_bounds(self, _epoch_scale(unit))
+            return time >= start and time < end
         return time >= self.start and time < self.end
 
     def __repr__(self):
@@ -608,11 +800,19 @@ class TimePeriod(object):
         Returns a string that uniquely identifies the time period.
         """
         if self.span == 'quarterly':
-            return "%04d-Q%01d" % (self.start.year, (self.end.month / 3))
+            return "%04d-Q%01d%s" % (self.start.year, (self.start.month + 2) // 3, self._tz_suffix())
         return self.isoformat()
 
     def __hash__(self):
-        return hash(str(self))
+        try:
+            return self._hash
+        except AttributeError:
+            self._hash = hash((self._span, self._start))
+            return self._hash
+
+    def __reduce__(self):
+        # The cached hash is not pickled, as it may differ between processes.
+        return (self.__class__, (None, None, self._span, self._start, self._end))
 
     @property
     def start(self):
@@ -626,158 +826,2432 @@ class TimePeriod(object):
     def span(self):
         return self._span
 
-    def __gt__(self, other):
-        return self.start >= other.end
-
+    # Periods are ordered by span, and then by start.
     def __eq__(self, other):
         if not isinstance(other, TimePeriod):
             return False
-        return self.start == other.start and self.end == other.end
+        return self._span == other._span and self._start == other._start
 
+    def __ne__(self, other):
+        return not self == other
 
-# Series functions
-
-def date_periods_descending(date=None, span=None, num_periods=None):
-    """
-    Returns a list of DatePeriod instances, starting with a period that
-    covers the given date and iterating through the preceeding periods.
-    """
-    assert num_periods is not None, '`num_periods` argument not supplied.'
+    def __lt__(self, other):
+        if not isinstance(other, TimePeriod):
+            return NotImplemented
+        if self._span == other._span:
+            return self._start < other._start
+        return _span_order[self._span] < _span_order[other._span]
 
-    ret = []
-    period = DatePeriod(date=date, span=span)
-    for idx in range(num_periods):
-        ret.append(period)
-        period = period.previous()
-    return ret
+    def __le__(self, other):
+        if not isinstance(other, TimePeriod):
+            return NotImplemented
+        if self._span == other._span:
+            return self._start <= other._start
+        return _span_order[self._span] < _span_order[other._span]
 
+    def __gt__(self, other):
+        if not isinstance(other, TimePeriod):
+            return NotImplemented
+        if self._span == other._span:
+            return self._start > other._start
+        return _span_order[self._span] > _span_order[other._span]
 
-def date_periods_ascending(date=None, span=None, num_periods=None):
-    """
-    Returns a list of DatePeriod instances, starting with a period that
-    covers the given date and iterating through the following periods.
-    """
-    assert num_periods is not None, '`num_periods` argument not supplied.'
+    def __ge__(self, other):
+        if not isinstance(other, TimePeriod):
+            return NotImplemented
+        if self._span == other._span:
+            return self._start >= other._start
+        return _span_order[self._span] > _span_order[other._span]
 
-    ret = []
-    period = DatePeriod(date=date, span=span)
-    for idx in range(num_periods):
-        ret.append(period)
-        period = period.next()
-    return ret
 
+# Parsing functions
 
-def date_periods_between(date_from=None, date_until=None, span=None):
+def parse_periods(strings, kind='date'):
     """
-    Returns a list of DatePeriod instances, starting and ending with
-    periods that cover the given start and end dates.
+    Given an iterable of period representations, return a list of the
+    corresponding DatePeriod or TimePeriod instances.
+
+    `kind` should be either 'date' or 'time'.
     """
-    period = DatePeriod(date=date_from, span=span)
-    until = DatePeriod(date=date_until, span=span)
-    ascending = until > period
+    if kind == 'date':
+        parse, period_class = _repr_to_date_and_span, DatePeriod
+    elif kind == 'time':
+        parse, period_class = _repr_to_time_and_span, TimePeriod
+    else:
+        raise ValueError("Invalid value for `kind` argument '%s'" % kind)
 
     ret = []
-    while not period == until:
-        ret.append(period)
-        period = period.next() if ascending else period.previous()
-    ret.append(period)
+    for string_repr in strings:
+        value, span = parse(string_repr)
+        ret.append(period_class(None, value, span))
     return ret
 
 
-def time_periods_descending(time=None, span=None, num_periods=None):
-    """
-    Returns a list of TimePeriod instances, starting with a period that
-    covers the given time and iterating through the preceeding periods.
-    """
-    assert num_periods is not None, '`num_periods` argument not supplied.'
+# Period caching
 
-    ret = []
-    period = TimePeriod(time=time, span=span)
-    for idx in range(num_periods):
-        ret.append(period)
-        period = period.previous()
-    return ret
+CacheInfo = collections.namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
 
 
-def time_periods_ascending(time=None, span=None, num_periods=None):
+class PeriodCache(object):
     """
-    Returns a list of TimePeriod instances, starting with a period that
-    covers the given time and iterating through the following periods.
+    A bounded, least-recently-used cache of period instances.
+
+    Looking up the same representation, or any date/time within the same
+    period, returns the same immutable DatePeriod or TimePeriod instance.
     """
-    assert num_periods is not None, '`num_periods` argument not supplied.'
+    def __init__(self, maxsize=1024):
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self.maxsize = maxsize
 
-    ret = []
-    period = TimePeriod(time=time, span=span)
-    for idx in range(num_periods):
-        ret.append(period)
-        period = period.next()
-    return ret
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, maxsize):
+        if maxsize < 0:
+            raise ValueError("Invalid value for `maxsize` argument '%s'" % maxsize)
+        with self._lock:
+            self._maxsize = maxsize
+            while len(self._entries) > maxsize:
+                self._entries.popitem(last=False)
+
+    def date_period(self, string_repr=None, date=None, span=None):
+        """
+        As `DatePeriod(...)`, but returns a cached instance if one exists.
+        """
+        if string_repr:
+            assert date is None, 'Cannot supply both `string_repr` and `date`'
+            assert span is None, 'Cannot supply both `string_repr` and `span`'
+            date, span = _repr_to_date_and_span(string_repr)
 
+        assert span is not None, '`span` argument not supplied.'
+        if date is None:
+            date = DatePeriod.today_func()
+        # Key on the period itself, so that its representation, any date
+        # within it, and any spelling of its span, find the same instance.
+        span = _normalize_span(span, _date_spans)
+        ordinal = DatePeriod._floor_ordinal(span, date)
+        key = ('date', span, ordinal)
+        return self._lookup(key, lambda: DatePeriod._from_ordinal(span, ordinal))
+
+    def time_period(self, string_repr=None, time=None, span=None):
+        """
+        As `TimePeriod(...)`, but returns a cached instance if one exists.
+        """
+        if string_repr:
+            assert time is None, 'Cannot supply both `string_repr` and `time`'
+            assert span is None, 'Cannot supply both `string_repr` and `span`'
+            time, span = _repr_to_time_and_span(string_repr)
 
-def time_periods_between(time_from=None, time_until=None, span=None):
-    """
-    Returns a list of TimePeriod instances, starting and ending with
-    periods that cover the given start and end times.
-    """
-    period = TimePeriod(time=time_from, span=span)
-    until = TimePeriod(time=time_until, span=span)
-    ascending = until > period
+        assert span is not None, '`span` argument not supplied.'
+        if time is None:
+            time = TimePeriod.now_func()
+        # Ordinals are based on wall clock time, so periods in different
+        # timezones may share an ordinal, and the offset forms part of the key.
+        span = _normalize_span(span, _time_spans)
+        ordinal = TimePeriod._floor_ordinal(span, time)
+        key = ('time', span, ordinal, time.utcoffset())
+        return self._lookup(key, lambda: TimePeriod._from_ordinal(span, ordinal, time.tzinfo))
+
+    def _lookup(self, key, factory):
+        with self._lock:
+            period = self._entries.pop(key, None)
+            if period is not None:
+                self._hits += 1
+                self._entries[key] = period
+                return period
+            self._misses += 1
+
+        period = factory()
+
+        with self._lock:
+            # Another thread may have populated the key in the meantime.
+            period = self._entries.setdefault(key, period)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+        return period
+
+    def info(self):
+        """
+        Return a `CacheInfo` named tuple of the cache statistics.
+        """
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._maxsize, len(self._entries))
 
-    ret = []
-    while not period == until:
-        ret.append(period)
-        period = period.next() if ascending else period.previous()
-    ret.append(period)
-    return ret
+    def clear(self):
+        """
+        Remove all cached periods, and reset the statistics.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
 
 
-# Aggregation functions
+# Series functions
 
-def _next_pair_or_none(iterator):
+class PeriodRange(Sequence):
     """
-    Returns the next pair in an iterator of pairs, or a pair of None.
+    An immutable sequence of the consecutive periods between, and including,
+    a start period and a stop period.
+
+    Periods are computed from their span ordinals as they are accessed,
+    so that lengths, indexing and lookups all take constant time.
     """
-    try:
-        return next(iterator)
-    except StopIteration:
-        return (None, None)
+    __slots__ = ('_period_class', '_span', '_tzinfo', '_first', '_step', '_length')
+
+    def __init__(self, start_period, stop_period):
+        distance = stop_period - start_period
+        self._period_class = start_period.__class__
+        self._span = start_period.span
+        self._tzinfo = _period_tzinfo(start_period)
+        self._first = start_period.ordinal
+        self._step = 1 if distance >= 0 else -1
+        self._length = abs(distance) + 1
+
+    def _derive(self, first, step, length):
+        # Return a new range with the same span and timezone as this one.
+        ret = self.__class__.__new__(self.__class__)
+        ret._period_class = self._period_class
+        ret._span = self._span
+        ret._tzinfo = self._tzinfo
+        ret._first = first
+        ret._step = step
+        ret._length = length
+        return ret
 
+    def _period(self, idx):
+        ordinal = self._first + (idx * self._step)
+        return self._period_class._from_ordinal(self._span, ordinal, self._tzinfo)
 
-def map(periods, data_points, transform=None):
-    """
-    Given a sequence of dates periods, and a list of date/value pairs,
-    map each value to the period containing it's date.
-    """
-    is_descending = periods and (periods[0] > periods[-1])
-    sort_by_date = lambda date_value_pair: date_value_pair[0]
-    date_value_iter = iter(sorted(data_points, key=sort_by_date, reverse=is_descending))
+    def __len__(self):
+        return self._length
 
-    ret = collections.OrderedDict()
-    date, value = _next_pair_or_none(date_value_iter)
-    for period in periods:
-        this_mapping = []
-        while date is not None and period.contains(date):
-            this_mapping.append(value)
-            date, value = _next_pair_or_none(date_value_iter)
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(self._length)
+            if step > 0:
+                length = max(0, (stop - start + step - 1) // step)
+            else:
+                length = max(0, (start - stop - step - 1) // -step)
+            return self._derive(self._first + (start * self._step), self._step * step, length)
 
-        if transform is not None:
-            this_mapping = transform(this_mapping)
+        if idx < 0:
+            idx += self._length
+        if not 0 <= idx < self._length:
+            raise IndexError('PeriodRange index out of range')
+        return self._period(idx)
 
-        ret[period] = this_mapping
+    def __iter__(self):
+        for idx in range(self._length):
+            yield self._period(idx)
 
-    return ret
+    def __reversed__(self):
+        return iter(self[::-1])
+
+    def __contains__(self, period):
+        try:
+            self.index(period)
+        except ValueError:
+            return False
+        return True
+
+    def __eq__(self, other):
+        if not isinstance(other, PeriodRange):
+            return False
+        # Ranges are arithmetic progressions, so are equal if their
+        # first two items are equal.
+        return len(self) == len(other) and list(self[:2]) == list(other[:2])
 
+    def __ne__(self, other):
+        return not self == other
 
-def summation(periods, data_points, zero=0):
-    sum_from_zero = lambda values: sum(values, zero)
-    return map(periods, data_points, transform=sum_from_zero)
+    __hash__ = None
 
+    def __repr__(self):
+        if self._length > 2:
+            return '<%s [%r, ..., %r]>' % (self.__class__.__name__, self[0], self[-1])
+        return '<%s %r>' % (self.__class__.__name__, list(self))
 
-def average(periods, data_points):
-    avg = lambda values: float(sum(values)) / len(values) if values else None
-    return map(periods, data_points, transform=avg)
+    @property
+    def span(self):
+        return self._span
 
+    def index(self, period):
+        """
+        Return the index of the given period, or raise `ValueError`
+        if it is not included in the range.
+        """
+        if isinstance(period, self._period_class) and period.span == self._span:
+            idx = self.index_of(period.start)
+            if self._period(idx) == period:
+                return idx
+        raise ValueError('%r is not in range' % (period,))
 
-def count(periods, dates):
-    date_value_pairs = [(date, None) for date in dates]
-    return map(periods, date_value_pairs, transform=len)
+    def index_of(self, time):
+        """
+        Return the index of the period containing the given date or time,
+        or raise `ValueError` if it is not covered by the range.
+        """
+        ordinal = self._period_class._floor_ordinal(self._span, time, self._tzinfo)
+        idx, remainder = divmod(ordinal - self._first, self._step)
+        if remainder or not 0 <= idx < self._length:
+            raise ValueError('%r is not covered by range' % (time,))
+        return idx
+
+
+def _period_tzinfo(period):
+    """
+    Return the timezone info of a TimePeriod, or `None` for a DatePeriod.
+    """
+    return getattr(period.start, 'tzinfo', None)
+
+
+def _iter_periods(period, num_periods, step):
+    """
+    Yields `num_periods` periods, starting with the given period,
+    and moving `step` periods each time.
+    """
+    for idx in range(num_periods):
+        yield period + (idx * step)
+
+
+def _time_period_in_timezone(time, span, tzinfo):
+    """
+    Return the TimePeriod covering the given time, converting the time
+    to the given timezone if both are timezone aware.
+    """
+    if time is None:
+        time = TimePeriod.now_func()
+    if time.tzinfo is not None and tzinfo is not None:
+        time = time.astimezone(tzinfo)
+    return TimePeriod(time=time, span=span)
+
+
+def iter_date_periods(date=None, span=None, num_periods=None, date_until=None, descending=False):
+    """
+    Lazily yields DatePeriod instances, starting with a period that
+    covers the given date.
+
+    Either yields `num_periods` periods, in ascending order unless
+    `descending` is set, or yields all the periods up to and including
+    the period that covers `date_until`.
+    """
+    period = DatePeriod(date=date, span=span)
+    if date_until is None:
+        assert num_periods is not None, '`num_periods` or `date_until` argument not supplied.'
+        return _iter_periods(period, num_periods, -1 if descending else 1)
+
+    assert num_periods is None, 'Cannot supply both `num_periods` and `date_until`'
+    return iter(PeriodRange(period, DatePeriod(date=date_until, span=span)))
+
+
+def iter_time_periods(time=None, span=None, num_periods=None, time_until=None, descending=False):
+    """
+    Lazily yields TimePeriod instances, starting with a period that
+    covers the given time.
+
+    Either yields `num_periods` periods, in ascending order unless
+    `descending` is set, or yields all the periods up to and including
+    the period that covers `time_until`.
+    """
+    period = TimePeriod(time=time, span=span)
+    if time_until is None:
+        assert num_periods is not None, '`num_periods` or `time_until` argument not supplied.'
+        return _iter_periods(period, num_periods, -1 if descending else 1)
+
+    assert num_periods is None, 'Cannot supply both `num_periods` and `time_until`'
+    until = _time_period_in_timezone(time_until, span, period.start.tzinfo)
+    return iter(PeriodRange(period, until))
+
+
+def date_periods_descending(date=None, span=None, num_periods=None):
+    """
+    Returns a list of DatePeriod instances, starting with a period that
+    covers the given date and iterating through the preceeding periods.
+    """
+    assert num_periods is not None, '`num_periods` argument not supplied.'
+    return list(iter_date_periods(date, span, num_periods, descending=True))
+
+
+def date_periods_ascending(date=None, span=None, num_periods=None):
+    """
+    Returns a list of DatePeriod instances, starting with a period that
+    covers the given date and iterating through the following periods.
+    """
+    assert num_periods is not None, '`num_periods` argument not supplied.'
+    return list(iter_date_periods(date, span, num_periods))
+
+
+def date_periods_between(date_from=None, date_until=None, span=None):
+    """
+    Returns a list of DatePeriod instances, starting and ending with
+    periods that cover the given start and end dates.
+    """
+    period = DatePeriod(date=date_from, span=span)
+    until = DatePeriod(date=date_until, span=span)
+    return list(PeriodRange(period, until))
+
+
+def time_periods_descending(time=None, span=None, num_periods=None):
+    """
+    Returns a list of TimePeriod instances, starting with a period that
+    covers the given time and iterating through the preceeding periods.
+    """
+    assert num_periods is not None, '`num_periods` argument not supplied.'
+    return list(iter_time_periods(time, span, num_periods, descending=True))
+
+
+def time_periods_ascending(time=None, span=None, num_periods=None):
+    """
+    Returns a list of TimePeriod instances, starting with a period that
+    covers the given time and iterating through the following periods.
+    """
+    assert num_periods is not None, '`num_periods` argument not supplied.'
+    return list(iter_time_periods(time, span, num_periods))
+
+
+def time_periods_between(time_from=None, time_until=None, span=None):
+    """
+    Returns a list of TimePeriod instances, starting and ending with
+    periods that cover the given start and end times.
+    """
+    period = TimePeriod(time=time_from, span=span)
+    until = _time_period_in_timezone(time_until, span, period.start.tzinfo)
+    return list(PeriodRange(period, until))
+
+
+# Reducers
+
+class Reducer(object):
+    """
+    Base class for reducers, which aggregate the values within a period
+    using a constant amount of memory.
+
+    A reducer is a stateless object that operates on accumulators:
+
+    * `init()` - Return a new, empty accumulator.
+    * `add(accumulator, value)` - Add a value, returning the updated accumulator.
+    * `merge(accumulator, other)` - Combine two accumulators, returning the result.
+    * `finalize(accumulator)` - Return the aggregated value for an accumulator.
+
+    Accumulators may be updated in place, or replaced by the returned value.
+    Because accumulators can be merged, partial results for subsets of the
+    data may be combined without revisiting the original values.
+
+    The `frame_typecode` attribute is the `array` typecode that holds the
+    aggregated values in a PeriodFrame, or `None` if they are not numbers.
+    """
+    frame_typecode = 'd'
+
+    def init(self):
+        raise NotImplementedError('`init()` must be implemented.')
+
+    def add(self, accumulator, value):
+        raise NotImplementedError('`add()` must be implemented.')
+
+    def merge(self, accumulator, other):
+        raise NotImplementedError('`merge()` must be implemented.')
+
+    def finalize(self, accumulator):
+        return accumulator
+
+    def __repr__(self):
+        return '<%s>' % self.__class__.__name__
+
+
+class Sum(Reducer):
+    """
+    The sum of the values, starting from `zero`.
+    """
+    def __init__(self, zero=0):
+        self.zero = zero
+
+    def init(self):
+        return self.zero
+
+    def add(self, accumulator, value):
+        return accumulator + value
+
+    def merge(self, accumulator, other):
+        return accumulator + other
+
+
+class Count(Reducer):
+    """
+    The number of values.
+    """
+    frame_typecode = 'q'
+
+    def init(self):
+        return 0
+
+    def add(self, accumulator, value):
+        return accumulator + 1
+
+    def merge(self, accumulator, other):
+        return accumulator + other
+
+
+class Mean(Reducer):
+    """
+    The mean of the values, or `None` if there are no values.
+    """
+    def init(self):
+        return [0, 0]  # [total, count]
+
+    def add(self, accumulator, value):
+        accumulator[0] += value
+        accumulator[1] += 1
+        return accumulator
+
+    def merge(self, accumulator, other):
+        accumulator[0] += other[0]
+        accumulator[1] += other[1]
+        return accumulator
+
+    def finalize(self, accumulator):
+        total, count = accumulator
+        return float(total) / count if count else None
+
+
+class Min(Reducer):
+    """
+    The smallest of the values, or `None` if there are no values.
+    """
+    def init(self):
+        return None
+
+    def add(self, accumulator, value):
+        if accumulator is None or value < accumulator:
+            return value
+        return accumulator
+
+    def merge(self, accumulator, other):
+        if other is None:
+            return accumulator
+        return self.add(accumulator, other)
+
+
+class Max(Reducer):
+    """
+    The largest of the values, or `None` if there are no values.
+    """
+    def init(self):
+        return None
+
+    def add(self, accumulator, value):
+        if accumulator is None or value > accumulator:
+            return value
+        return accumulator
+
+    def merge(self, accumulator, other):
+        if other is None:
+            return accumulator
+        return self.add(accumulator, other)
+
+
+class Variance(Reducer):
+    """
+    The variance of the values, using Welford's online algorithm.
+
+    By default this is the population variance. Set `ddof=1` for the sample
+    variance. Returns `None` if there are not more than `ddof` values.
+    """
+    def __init__(self, ddof=0):
+        self.ddof = ddof
+
+    def init(self):
+        return [0, 0.0, 0.0]  # [count, mean, sum of squared differences]
+
+    def add(self, accumulator, value):
+        accumulator[0] += 1
+        delta = value - accumulator[1]
+        accumulator[1] += delta / float(accumulator[0])
+        accumulator[2] += delta * (value - accumulator[1])
+        return accumulator
+
+    def merge(self, accumulator, other):
+        count = accumulator[0] + other[0]
+        if not other[0]:
+            return accumulator
+        elif not accumulator[0]:
+            accumulator[:] = other
+            return accumulator
+        delta = other[1] - accumulator[1]
+        accumulator[2] += other[2] + (delta * delta * accumulator[0] * other[0] / float(count))
+        accumulator[1] += delta * other[0] / float(count)
+        accumulator[0] = count
+        return accumulator
+
+    def finalize(self, accumulator):
+        count, mean, sum_of_squares = accumulator
+        if count <= self.ddof:
+            return None
+        return sum_of_squares / (count - self.ddof)
+
+
+Statistics = collections.namedtuple('Statistics', ['count', 'sum', 'min', 'max', 'mean', 'stddev'])
+
+
+class Describe(Reducer):
+    """
+    Summary statistics of the values, computed together in a single pass,
+    as a `Statistics` named tuple of count, sum, min, max, mean and
+    standard deviation.
+
+    The standard deviation uses Welford's online algorithm. By default this
+    is the population standard deviation. Set `ddof=1` for the sample
+    standard deviation.
+    """
+    frame_typecode = None
+
+    def __init__(self, ddof=0):
+        self.ddof = ddof
+
+    def init(self):
+        # [count, sum, min, max, running mean, sum of squared differences]
+        return [0, 0, None, None, 0.0, 0.0]
+
+    def add(self, accumulator, value):
+        count = accumulator[0] + 1
+        accumulator[0] = count
+        accumulator[1] += value
+        if count == 1 or value < accumulator[2]:
+            accumulator[2] = value
+        if count == 1 or value > accumulator[3]:
+            accumulator[3] = value
+        delta = value - accumulator[4]
+        accumulator[4] += delta / float(count)
+        accumulator[5] += delta * (value - accumulator[4])
+        return accumulator
+
+    def merge(self, accumulator, other):
+        if not other[0]:
+            return accumulator
+        elif not accumulator[0]:
+            accumulator[:] = other
+            return accumulator
+        count = accumulator[0] + other[0]
+        delta = other[4] - accumulator[4]
+        accumulator[5] += other[5] + (delta * delta * accumulator[0] * other[0] / float(count))
+        accumulator[4] += delta * other[0] / float(count)
+        accumulator[0] = count
+        accumulator[1] += other[1]
+        accumulator[2] = min(accumulator[2], other[2])
+        accumulator[3] = max(accumulator[3], other[3])
+        return accumulator
+
+    def finalize(self, accumulator):
+        count, total, minimum, maximum, mean, sum_of_squares = accumulator
+        if not count:
+            return Statistics(0, total, None, None, None, None)
+        stddev = math.sqrt(sum_of_squares / (count - self.ddof)) if count > self.ddof else None
+        return Statistics(count, total, minimum, maximum, float(total) / count, stddev)
+
+
+# Sketches
+
+class QuantileSketch(object):
+    """
+    A mergeable, bounded memory sketch for estimating quantiles, in the
+    style of DDSketch.
+
+    Values are counted in logarithmically sized bins, so that any quantile
+    is estimated to within `relative_accuracy` of its true value. Sketches
+    with the same relative accuracy can be merged, giving the same result
+    as if every value had been added to a single sketch.
+
+    If the number of bins grows beyond `max_bins`, the bins for the values
+    closest to zero are collapsed together, so that the accuracy of the
+    higher quantiles is preserved.
+    """
+    def __init__(self, relative_accuracy=0.01, max_bins=2048):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError('relative_accuracy must be between 0 and 1')
+        if max_bins < 1:
+            raise ValueError('max_bins must be at least 1')
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.count = 0
+        self.min = None
+        self.max = None
+        self._gamma = (1.0 + relative_accuracy) / (1.0 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._positive = {}
+        self._negative = {}
+        self._zero_count = 0
+
+    def _key(self, value):
+        return int(math.ceil(math.log(value) / self._log_gamma))
+
+    def _value(self, key):
+        return 2.0 * (self._gamma ** key) / (self._gamma + 1.0)
+
+    def _collapse(self, bins):
+        if len(bins) <= self.max_bins:
+            return
+        keys = sorted(bins)
+        num_collapsed = len(keys) - self.max_bins + 1
+        target = keys[num_collapsed - 1]
+        for key in keys[:num_collapsed - 1]:
+            bins[target] += bins.pop(key)
+
+    def add(self, value):
+        """
+        Add a value to the sketch.
+        """
+        if value > 0:
+            key = self._key(value)
+            self._positive[key] = self._positive.get(key, 0) + 1
+            self._collapse(self._positive)
+        elif value < 0:
+            key = self._key(-value)
+            self._negative[key] = self._negative.get(key, 0) + 1
+            self._collapse(self._negative)
+        else:
+            self._zero_count += 1
+        if self.count == 0 or value < self.min:
+            self.min = value
+        if self.count == 0 or value > self.max:
+            self.max = value
+        self.count += 1
+
+    def merge(self, other):
+        """
+        Merge another sketch into this one, returning this sketch.
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Cannot merge sketches with different relative accuracy')
+        if not other.count:
+            return self
+        for bins, other_bins in ((self._positive, other._positive), (self._negative, other._negative)):
+            for key, bin_count in other_bins.items():
+                bins[key] = bins.get(key, 0) + bin_count
+            self._collapse(bins)
+        self._zero_count += other._zero_count
+        if self.count == 0 or other.min < self.min:
+            self.min = other.min
+        if self.count == 0 or other.max > self.max:
+            self.max = other.max
+        self.count += other.count
+        return self
+
+    def quantile(self, q):
+        """
+        Return the estimated value at quantile `q`, which should be between
+        0 and 1, or `None` if the sketch is empty.
+        """
+        if not 0 <= q <= 1:
+            raise ValueError('Quantiles must be between 0 and 1')
+        if not self.count:
+            return None
+        elif q == 0:
+            return self.min
+        elif q == 1:
+            return self.max
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self._negative, reverse=True):
+            seen += self._negative[key]
+            if seen > rank:
+                return min(max(-self._value(key), self.min), self.max)
+        seen += self._zero_count
+        if seen > rank:
+            return 0
+        for key in sorted(self._positive):
+            seen += self._positive[key]
+            if seen > rank:
+                return max(min(self._value(key), self.max), self.min)
+        return self.max
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return '<QuantileSketch count=%d relative_accuracy=%r>' % (self.count, self.relative_accuracy)
+
+
+class QuantileSketches(Reducer):
+    """
+    A `QuantileSketch` of the values, which may be merged with other
+    sketches with the same relative accuracy.
+    """
+    frame_typecode = None
+
+    def __init__(self, relative_accuracy=0.01, max_bins=2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+
+    def init(self):
+        return QuantileSketch(self.relative_accuracy, self.max_bins)
+
+    def add(self, accumulator, value):
+        accumulator.add(value)
+        return accumulator
+
+    def merge(self, accumulator, other):
+        return accumulator.merge(other)
+
+
+class Quantiles(QuantileSketches):
+    """
+    Estimated quantiles of the values, as an ordered dictionary mapping
+    each of `qs` to its value, or `None` if there are no values.
+    """
+    def __init__(self, qs=(0.5, 0.95, 0.99), relative_accuracy=0.01, max_bins=2048):
+        super().__init__(relative_accuracy, max_bins)
+        for q in qs:
+            if not 0 <= q <= 1:
+                raise ValueError('Quantiles must be between 0 and 1')
+        self.qs = tuple(qs)
+
+    def finalize(self, accumulator):
+        if not accumulator.count:
+            return None
+        return collections.OrderedDict((q, accumulator.quantile(q)) for q in self.qs)
+
+
+def _stable_hash(value):
+    """
+    Return a 64 bit hash of a value that, unlike `hash()`, is the same
+    across processes and interpreter runs.
+
+    Other values are hashed by their `repr()`, except that whole numbers
+    are hashed as integers, so that `1`, `1.0` and `True` are the same value.
+    """
+    if isinstance(value, bytes):
+        data = b'b:' + value
+    elif isinstance(value, str):
+        data = b's:' + value.encode('utf-8')
+    else:
+        if type(value) is not int and isinstance(value, numbers.Number):
+            try:
+                if value == int(value):
+                    value = int(value)
+            except (TypeError, ValueError, OverflowError):
+                pass
+        data = b'r:' + repr(value).encode('utf-8')
+    return int(hashlib.sha1(data).hexdigest()[:16], 16)
+
+
+class HyperLogLog(object):
+    """
+    A mergeable, bounded memory sketch for estimating the number of
+    distinct values.
+
+    The sketch uses `2 ** precision` registers, and has a relative standard
+    error of approximately `1.04 / sqrt(2 ** precision)`, around 1.6% for the
+    default precision of 12. Values are counted exactly until there are more
+    than `exact_threshold` distinct values, which defaults to a sixteenth of
+    the number of registers.
+
+    Sketches with the same precision can be merged, giving the same result
+    as if every value had been added to a single sketch.
+    """
+    def __init__(self, precision=12, exact_threshold=None):
+        if not 4 <= precision <= 16:
+            raise ValueError('precision must be between 4 and 16')
+        self.precision = precision
+        self.exact_threshold = (1 << precision) // 16 if exact_threshold is None else exact_threshold
+        self._exact = set()
+        self._registers = None
+
+    @property
+    def error(self):
+        """
+        The relative standard error of the estimated count.
+        """
+        return 1.04 / math.sqrt(1 << self.precision)
+
+    def _add_hash(self, hashed):
+        index = hashed >> (64 - self.precision)
+        remainder = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = 64 - self.precision - remainder.bit_length() + 1
+        if rank > self._registers[index]:
+            self._registers[index] = rank
+
+    def _to_registers(self):
+        self._registers = bytearray(1 << self.precision)
+        for hashed in self._exact:
+            self._add_hash(hashed)
+        self._exact = None
+
+    def add(self, value):
+        """
+        Add a value to the sketch.
+        """
+        hashed = _stable_hash(value)
+        if self._registers is not None:
+            self._add_hash(hashed)
+            return
+        self._exact.add(hashed)
+        if len(self._exact) > self.exact_threshold:
+            self._to_registers()
+
+    def merge(self, other):
+        """
+        Merge another sketch into this one, returning this sketch.
+        """
+        if other.precision != self.precision:
+            raise ValueError('Cannot merge sketches with different precision')
+        if self._registers is None and other._registers is None:
+            self._exact.update(other._exact)
+            if len(self._exact) > self.exact_threshold:
+                self._to_registers()
+            return self
+        if self._registers is None:
+            self._to_registers()
+        if other._registers is None:
+            for hashed in other._exact:
+                self._add_hash(hashed)
+            return self
+        registers = self._registers
+        for index, rank in enumerate(other._registers):
+            if rank > registers[index]:
+                registers[index] = rank
+        return self
+
+    def count(self):
+        """
+        Return the estimated number of distinct values.
+        """
+        if self._registers is None:
+            return len(self._exact)
+        num_registers = 1 << self.precision
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(num_registers, 0.7213 / (1 + 1.079 / num_registers))
+        estimate = alpha * num_registers * num_registers / sum(2.0 ** -rank for rank in self._registers)
+        zeros = self._registers.count(0)
+        if estimate <= 2.5 * num_registers and zeros:
+            # Linear counting gives better estimates for small cardinalities.
+            estimate = num_registers * math.log(float(num_registers) / zeros)
+        return int(round(estimate))
+
+    def __len__(self):
+        return self.count()
+
+    def __repr__(self):
+        return '<HyperLogLog count=%d precision=%d>' % (self.count(), self.precision)
+
+
+class DistinctSketches(Reducer):
+    """
+    A `HyperLogLog` sketch of the values, which may be merged with other
+    sketches with the same precision.
+    """
+    frame_typecode = None
+
+    def __init__(self, precision=12):
+        self.precision = precision
+
+    def init(self):
+        return HyperLogLog(self.precision)
+
+    def add(self, accumulator, value):
+        accumulator.add(value)
+        return accumulator
+
+    def merge(self, accumulator, other):
+        return accumulator.merge(other)
+
+
+class DistinctCount(DistinctSketches):
+    """
+    The estimated number of distinct values.
+    """
+    frame_typecode = 'q'
+
+    def finalize(self, accumulator):
+        return accumulator.count()
+
+
+# Aggregation functions
+
+def _epoch_scale(unit):
+    """
+    Return the number of epoch timestamp units in a second.
+    """
+    try:
+        return _epoch_units[unit]
+    except (KeyError, TypeError):
+        raise ValueError("Invalid value for `unit` argument '%s'" % unit)
+
+
+def _epoch_bounds(period, scale):
+    """
+    Return a two-tuple of the epoch timestamps of the start of a period,
+    and the start of the following period, with naive times and dates
+    treated as UTC.
+    """
+    if isinstance(period, TimePeriod):
+        start = calendar.timegm(period.start.utctimetuple())
+        end = calendar.timegm(period.end.utctimetuple())
+    else:
+        start = calendar.timegm(period.start.timetuple())
+        end = calendar.timegm(period.end.timetuple()) + 86400
+    return (start * scale, end * scale)
+
+
+def _epoch_locator(periods, unit):
+    """
+    As `_period_locator()`, but for epoch timestamps in the given unit.
+
+    The epoch boundaries of each period are computed up front, so each
+    timestamp is located by bisection without creating a datetime.
+    """
+    scale = _epoch_scale(unit)
+    periods = list(periods)
+
+    # Group the periods by class, span and timezone offset, so that the
+    # periods within each group do not overlap.
+    groups = collections.OrderedDict()
+    for idx, period in enumerate(periods):
+        tzinfo = _period_tzinfo(period)
+        offset = None if tzinfo is None else period.start.utcoffset()
+        start, end = _epoch_bounds(period, scale)
+        bounds = groups.setdefault((period.__class__, period.span, offset), {})
+        bounds.setdefault(start, (end, idx))
+
+    tables = []
+    for bounds in groups.values():
+        starts = sorted(bounds)
+        tables.append((starts, [bounds[start][0] for start in starts], [bounds[start][1] for start in starts]))
+
+    bisect_right = bisect.bisect_right
+    if len(tables) == 1:
+        ((starts, ends, indices),) = tables
+
+        def locate(timestamp):
+            pos = bisect_right(starts, timestamp) - 1
+            if pos >= 0 and timestamp < ends[pos]:
+                return indices[pos]
+            return None
+    else:
+        def locate(timestamp):
+            for starts, ends, indices in tables:
+                pos = bisect_right(starts, timestamp) - 1
+                if pos >= 0 and timestamp < ends[pos]:
+                    return indices[pos]
+            return None
+    return (periods, locate)
+
+
+def _period_locator(periods, unit=None):
+    """
+    Given an iterable of periods, return a two-tuple of a sequence of the
+    periods, and a function that maps a date or time onto the index of
+    the period that contains it, or `None`.
+
+    Dates and times are floored to the ordinal of their containing period,
+    so they do not need to be sorted, and do not need to be compared
+    against each period in turn.
+
+    If `unit` is given, the data points are epoch timestamps in that unit.
+    """
+    if unit is not None:
+        return _epoch_locator(periods, unit)
+    if isinstance(periods, PeriodRange):
+        floor = _floor_func(periods._span, periods._tzinfo)
+        first, step, length = periods._first, periods._step, len(periods)
+
+        def locate(time):
+            idx, remainder = divmod(floor(time) - first, step)
+            if remainder or not 0 <= idx < length:
+                return None
+            return idx
+        return (periods, locate)
+
+    periods = list(periods)
+
+    # Group the periods by class, span and timezone offset, mapping
+    # the ordinal of each period onto its index.
+    groups = collections.OrderedDict()
+    for idx, period in enumerate(periods):
+        tzinfo = _period_tzinfo(period)
+        offset = None if tzinfo is None else period.start.utcoffset()
+        key = (period.__class__, period.span, offset)
+        if key not in groups:
+            groups[key] = (_floor_func(period.span, tzinfo), {})
+        floor, lookup = groups[key]
+        lookup.setdefault(period.ordinal, idx)
+
+    if len(groups) == 1:
+        ((floor, lookup),) = groups.values()
+        get = lookup.get
+
+        def locate(time):
+            return get(floor(time))
+    else:
+        groups = list(groups.values())
+
+        def locate(time):
+            for floor, lookup in groups:
+                idx = lookup.get(floor(time))
+                if idx is not None:
+                    return idx
+            return None
+    return (periods, locate)
+
+
+class PeriodDict(collections.OrderedDict):
+    """
+    An ordered dictionary mapping each period onto an aggregated value.
+
+    The `out_of_range` attribute is the number of data points
+    that were not contained by any of the periods.
+    """
+    out_of_range = 0
+
+
+def _period_dict(periods, values, out_of_range):
+    """
+    Return a PeriodDict mapping each period onto the corresponding value.
+    """
+    ret = PeriodDict()
+    for period, value in zip(periods, values):
+        if period not in ret:
+            ret[period] = value
+    ret.out_of_range = out_of_range
+    return ret
+
+
+class PeriodFrame(object):
+    """
+    A columnar alternative to PeriodDict, holding the ordinal of each period
+    in an `array('q')` and its value in an `array('d')`, with `None` stored
+    as NaN, or in an `array('q')` for counts. Period objects are only
+    created as they are accessed.
+
+    Supports the read only dictionary interface, mapping periods onto
+    values. The `ordinals` and `data` arrays support the buffer protocol,
+    so they can be exported without copying.
+    """
+    __slots__ = ('_period_class', '_span', '_tzinfo', 'ordinals', 'data', 'out_of_range', '_index')
+
+    def __init__(self, period_class, span, tzinfo, ordinals, data, out_of_range=0):
+        self._period_class = period_class
+        self._span = span
+        self._tzinfo = tzinfo
+        self.ordinals = ordinals
+        self.data = data
+        self.out_of_range = out_of_range
+        self._index = None
+
+    @property
+    def span(self):
+        return self._span
+
+    def _period(self, ordinal):
+        return self._period_class._from_ordinal(self._span, ordinal, self._tzinfo)
+
+    def _value(self, value):
+        return None if value != value else value  # NaN is stored for `None`.
+
+    def _lookup(self, period):
+        if not isinstance(period, self._period_class) or period.span != self._span:
+            return None
+        tzinfo = _period_tzinfo(period)
+        offset = None if tzinfo is None else period.start.utcoffset()
+        expected = None if self._tzinfo is None else self._tzinfo.utcoffset(period.start)
+        if offset != expected:
+            return None
+        if self._index is None:
+            self._index = dict((ordinal, idx) for idx, ordinal in enumerate(self.ordinals))
+        return self._index.get(period.ordinal)
+
+    def __len__(self):
+        return len(self.ordinals)
+
+    def __iter__(self):
+        for ordinal in self.ordinals:
+            yield self._period(ordinal)
+
+    def __contains__(self, period):
+        return self._lookup(period) is not None
+
+    def __getitem__(self, period):
+        idx = self._lookup(period)
+        if idx is None:
+            raise KeyError(period)
+        return self._value(self.data[idx])
+
+    def get(self, period, default=None):
+        idx = self._lookup(period)
+        if idx is None:
+            return default
+        return self._value(self.data[idx])
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [self._value(value) for value in self.data]
+
+    def items(self):
+        return list(zip(self, self.values()))
+
+    def to_dict(self):
+        """
+        Return the results as a PeriodDict.
+        """
+        return _period_dict(list(self), self.values(), self.out_of_range)
+
+    def to_numpy(self):
+        """
+        Return a two-tuple of NumPy arrays of the ordinals and values,
+        which share memory with the frame rather than copying it.
+        """
+        import numpy
+        return (numpy.frombuffer(self.ordinals, dtype=numpy.int64), numpy.frombuffer(self.data, dtype=numpy.dtype(self.data.typecode)))
+
+    def __eq__(self, other):
+        if isinstance(other, PeriodFrame):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '<PeriodFrame %s, %d periods>' % (self._span, len(self))
+
+
+def _period_frame(periods, values, out_of_range, typecode='d'):
+    """
+    Return a PeriodFrame holding each period and the corresponding value,
+    with the values in an array of the given typecode.
+    """
+    if isinstance(periods, PeriodRange):
+        ordinals = array.array('q', range(periods._first, periods._first + (periods._step * len(periods)), periods._step))
+        data = array.array(typecode, [float('nan') if value is None else value for value in values])
+        return PeriodFrame(periods._period_class, periods._span, periods._tzinfo, ordinals, data, out_of_range)
+
+    ordinals = array.array('q')
+    data = array.array(typecode)
+    groups = set()
+    seen = set()
+    period_class = DatePeriod
+    span = tzinfo = None
+    for period, value in zip(periods, values):
+        tzinfo = _period_tzinfo(period)
+        offset = None if tzinfo is None else period.start.utcoffset()
+        groups.add((period.__class__, period.span, offset))
+        if len(groups) > 1:
+            raise ValueError('PeriodFrame requires periods with the same span and timezone')
+        ordinal = period.ordinal
+        if ordinal in seen:
+            continue
+        seen.add(ordinal)
+        period_class, span = period.__class__, period.span
+        ordinals.append(ordinal)
+        data.append(float('nan') if value is None else value)
+    return PeriodFrame(period_class, span, tzinfo, ordinals, data, out_of_range)
+
+
+def map(periods, data_points, transform=None, unit=None):
+    """
+    Given a sequence of dates periods, and a list of date/value pairs,
+    map each value to the period containing it's date.
+
+    Data points do not need to be sorted, and values are listed in the
+    order they occur. Data points not contained by any of the periods are
+    counted in the `out_of_range` attribute of the returned PeriodDict.
+
+    If `unit` is given, the dates are epoch timestamps in that unit,
+    one of 's', 'ms', 'us' or 'ns'.
+    """
+    periods, locate = _period_locator(periods, unit)
+    mappings = [[] for idx in range(len(periods))]
+    out_of_range = 0
+    for date, value in data_points:
+        idx = locate(date)
+        if idx is None:
+            out_of_range += 1
+        else:
+            mappings[idx].append(value)
+
+    if transform is not None:
+        mappings = [transform(mapping) for mapping in mappings]
+
+    return _period_dict(periods, mappings, out_of_range)
+
+
+def _reduce(periods, locate, data_points, reducer):
+    """
+    Reduce the data points into a list of accumulators, one for each
+    period, returning a two-tuple of the accumulators and the number
+    of data points that were out of range.
+    """
+    init, add = reducer.init, reducer.add
+    accumulators = [init() for idx in range(len(periods))]
+    out_of_range = 0
+    for date, value in data_points:
+        idx = locate(date)
+        if idx is None:
+            out_of_range += 1
+        else:
+            accumulators[idx] = add(accumulators[idx], value)
+    return (accumulators, out_of_range)
+
+
+# State for worker processes, set by `_init_worker()`.
+_worker_state = None
+
+
+def _init_worker(periods, data_points, reducer, unit):
+    global _worker_state
+    periods, locate = _period_locator(periods, unit)
+    _worker_state = (periods, locate, data_points, reducer)
+
+
+def _reduce_chunk(bounds, data_points=None):
+    """
+    Reduce a chunk of the data points in a worker process. The chunk is
+    either passed in, or sliced from the data points the worker inherited.
+    """
+    periods, locate, inherited, reducer = _worker_state
+    if data_points is None:
+        data_points = inherited[bounds[0]:bounds[1]]
+    return _reduce(periods, locate, data_points, reducer)
+
+
+def _parallel_reduce(periods, data_points, reducer, workers, unit=None):
+    """
+    Split the data points into a chunk for each worker, reduce each chunk
+    in a process pool, and merge the accumulators of each chunk in order.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    data_points = list(data_points)
+    chunk_size = max(1, -(-len(data_points) // workers))
+    bounds = [(idx, idx + chunk_size) for idx in range(0, len(data_points), chunk_size)]
+    if len(bounds) < 2:
+        periods, locate = _period_locator(periods, unit)
+        return _reduce(periods, locate, data_points, reducer)
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        # Forked workers inherit the data points, which is much
+        # faster than pickling each chunk and sending it to a worker.
+        context = multiprocessing.get_context('fork')
+        initargs = (periods, data_points, reducer, unit)
+        chunks = [None] * len(bounds)
+    else:
+        context = None
+        initargs = (periods, None, reducer, unit)
+        chunks = [data_points[start:stop] for start, stop in bounds]
+
+    with ProcessPoolExecutor(workers, context, _init_worker, initargs) as executor:
+        results = executor.map(_reduce_chunk, bounds, chunks)
+        accumulators, out_of_range = next(results)
+        merge = reducer.merge
+        for other_accumulators, other_out_of_range in results:
+            accumulators = [merge(accumulator, other) for accumulator, other in zip(accumulators, other_accumulators)]
+            out_of_range += other_out_of_range
+    return (accumulators, out_of_range)
+
+
+def _reduce_sorted(periods, data_points, reducer):
+    """
+    Reduce data points that are sorted by date or time into a list of
+    accumulators, one for each period, by advancing through the periods
+    in step with the data points, returning a two-tuple of the accumulators
+    and the number of data points that were out of range.
+
+    Raises a ValueError if the data points are not sorted.
+    """
+    groups = set()
+    lookup = {}
+    for idx, period in enumerate(periods):
+        tzinfo = _period_tzinfo(period)
+        offset = None if tzinfo is None else period.start.utcoffset()
+        groups.add((period.__class__, period.span, offset))
+        lookup.setdefault(period.ordinal, idx)
+    if len(groups) > 1:
+        raise ValueError('Sorted data points require periods with the same span and timezone')
+
+    init, add = reducer.init, reducer.add
+    accumulators = [init() for idx in range(len(periods))]
+    if not periods:
+        return (accumulators, sum(1 for data_point in data_points))
+    floor = _floor_func(periods[0].span, _period_tzinfo(periods[0]))
+    ordinals = sorted(lookup)
+    indices = [lookup[ordinal] for ordinal in ordinals]
+    num_ordinals = len(ordinals)
+    position = 0
+    previous = float('-inf')
+    idx = None
+    out_of_range = 0
+    for date, value in data_points:
+        ordinal = floor(date)
+        if ordinal != previous:
+            # Only advance through the periods when moving onto a new one.
+            if ordinal < previous:
+                raise ValueError('Data points are not sorted by date or time')
+            previous = ordinal
+            while position < num_ordinals and ordinals[position] < ordinal:
+                position += 1
+            if position < num_ordinals and ordinals[position] == ordinal:
+                idx = indices[position]
+            else:
+                idx = None
+        if idx is None:
+            out_of_range += 1
+        else:
+            accumulators[idx] = add(accumulators[idx], value)
+    return (accumulators, out_of_range)
+
+
+def aggregate(periods, data_points, reducer, workers=None, assume_sorted=False, frame=False, unit=None):
+    """
+    Given a sequence of periods, and a list of date/value pairs, reduce
+    the values contained by each period using the given reducer.
+
+    If `workers` is more than one, the data points are split into chunks
+    that are reduced in parallel by a pool of worker processes.
+
+    If `assume_sorted` is set, the data points must be sorted in ascending
+    order of date or time, and are matched to periods by advancing through
+    them in step. A ValueError is raised if the data points are not sorted.
+
+    If `frame` is set, a columnar PeriodFrame is returned rather than a
+    PeriodDict. The reducer must return numbers or `None`, and a ValueError
+    is raised for reducers that do not, such as `Describe`.
+
+    If `unit` is given, the dates are epoch timestamps in that unit,
+    one of 's', 'ms', 'us' or 'ns'.
+    """
+    if workers is not None and workers < 1:
+        raise ValueError('workers must be at least 1')
+    if frame and reducer.frame_typecode is None:
+        raise ValueError('Cannot return a PeriodFrame for %r, which does not return numbers' % reducer)
+    if assume_sorted:
+        if workers is not None and workers > 1:
+            raise ValueError('Cannot use both `workers` and `assume_sorted`')
+        if unit is not None:
+            raise ValueError('Cannot use both `unit` and `assume_sorted`')
+        periods = list(periods)
+        accumulators, out_of_range = _reduce_sorted(periods, data_points, reducer)
+    elif workers is not None and workers > 1:
+        if not isinstance(periods, PeriodRange):
+            periods = list(periods)
+        accumulators, out_of_range = _parallel_reduce(periods, data_points, reducer, workers, unit)
+    else:
+        periods, locate = _period_locator(periods, unit)
+        accumulators, out_of_range = _reduce(periods, locate, data_points, reducer)
+    finalize = reducer.finalize
+    values = [finalize(accumulator) for accumulator in accumulators]
+    if frame:
+        try:
+            return _period_frame(periods, values, out_of_range, reducer.frame_typecode)
+        except TypeError:
+            raise ValueError('Cannot return a PeriodFrame for %r, which does not return numbers' % reducer)
+    return _period_dict(periods, values, out_of_range)
+
+
+def aggregate_batches(periods, batches, reducer):
+    """
+    Given a sequence of periods, and an iterable of batches of date/value
+    pairs, reduce the values contained by each period using the given
+    reducer.
+
+    Only one batch is held at a time, so the data points may be streamed
+    from files or database cursors that do not fit in memory.
+    """
+    return aggregate(periods, itertools.chain.from_iterable(batches), reducer)
+
+
+def aggregate_sorted(periods, sources, reducer):
+    """
+    Given a sequence of periods, and several iterables of date/value pairs
+    that are each sorted in ascending order of date or time, lazily merge
+    the sources and reduce the values contained by each period using the
+    given reducer.
+    """
+    data_points = heapq.merge(*sources, key=operator.itemgetter(0))
+    return aggregate(periods, data_points, reducer, assume_sorted=True)
+
+
+def aggregate_grouped(periods, data_points, reducer):
+    """
+    Given a sequence of periods, and a list of date/group/value triples,
+    reduce the values for each group contained by each period using the
+    given reducer, in a single pass.
+
+    Each period is mapped onto an ordered dictionary of every group, in the
+    order that each group first occurs, onto its aggregated value.
+    """
+    periods, locate = _period_locator(periods)
+    init, add = reducer.init, reducer.add
+    columns = collections.OrderedDict()
+    rows = [[] for idx in range(len(periods))]
+    out_of_range = 0
+    for date, group, value in data_points:
+        idx = locate(date)
+        if idx is None:
+            out_of_range += 1
+            continue
+        column = columns.get(group)
+        if column is None:
+            column = columns[group] = len(columns)
+        row = rows[idx]
+        if column >= len(row):
+            row.extend([init() for missing in range(column + 1 - len(row))])
+        row[column] = add(row[column], value)
+
+    finalize = reducer.finalize
+    values = []
+    for row in rows:
+        row.extend([init() for missing in range(len(columns) - len(row))])
+        values.append(collections.OrderedDict(
+            (group, finalize(accumulator)) for group, accumulator in zip(columns, row)
+        ))
+    return _period_dict(periods, values, out_of_range)
+
+
+def summation(periods, data_points, zero=0, workers=None, frame=False, unit=None):
+    return aggregate(periods, data_points, Sum(zero), workers, frame=frame, unit=unit)
+
+
+def average(periods, data_points, workers=None, frame=False, unit=None):
+    return aggregate(periods, data_points, Mean(), workers, frame=frame, unit=unit)
+
+
+def describe(periods, data_points, ddof=0, workers=None):
+    """
+    Given a sequence of periods, and a list of date/value pairs, return
+    the count, sum, min, max, mean and standard deviation of the values
+    contained by each period, in a single pass.
+    """
+    return aggregate(periods, data_points, Describe(ddof), workers)
+
+
+def quantiles(periods, data_points, qs=(0.5, 0.95, 0.99), relative_accuracy=0.01):
+    """
+    Given a sequence of periods, and a list of date/value pairs, return
+    the estimated quantiles of the values contained by each period.
+    """
+    return aggregate(periods, data_points, Quantiles(qs, relative_accuracy))
+
+
+def quantile_sketches(periods, data_points, relative_accuracy=0.01):
+    """
+    Given a sequence of periods, and a list of date/value pairs, return
+    a mergeable quantile sketch of the values contained by each period.
+    """
+    return aggregate(periods, data_points, QuantileSketches(relative_accuracy))
+
+
+def distinct_count(periods, data_points, precision=12):
+    """
+    Given a sequence of periods, and a list of date/value pairs, return
+    the estimated number of distinct values contained by each period.
+    """
+    return aggregate(periods, data_points, DistinctCount(precision))
+
+
+def distinct_sketches(periods, data_points, precision=12):
+    """
+    Given a sequence of periods, and a list of date/value pairs, return
+    a mergeable distinct count sketch of the values contained by each period.
+    """
+    return aggregate(periods, data_points, DistinctSketches(precision))
+
+
+def count(periods, dates, workers=None, frame=False, unit=None):
+    data_points = ((date, None) for date in dates)
+    return aggregate(periods, data_points, Count(), workers, frame=frame, unit=unit)
+
+
+# Rolling window functions
+#
+# These accept the results of an aggregation, such as the PeriodDict
+# returned by `summation()`, and return the value over a trailing window
+# of periods ending with each period. Windows are measured in period
+# ordinals, so any periods missing from the results are treated as empty.
+
+def _rolling(results, window, func):
+    """
+    Call `func` with each period ordinal and value in chronological order,
+    and the ordinal of the latest period to fall out of the window, and
+    return a PeriodDict of the returned values, in the order of `results`.
+    """
+    if window < 1:
+        raise ValueError('window must be at least 1')
+    periods = list(results.keys())
+    if len(set((period.__class__, period.span) for period in periods)) > 1:
+        raise ValueError('Rolling windows require periods with the same span')
+    chronological = sorted(periods, key=operator.attrgetter('ordinal'))
+    rolled = {}
+    for period in chronological:
+        ordinal = period.ordinal
+        rolled[period] = func(ordinal, results[period], ordinal - window)
+    ret = PeriodDict((period, rolled[period]) for period in periods)
+    ret.out_of_range = getattr(results, 'out_of_range', 0)
+    return ret
+
+
+def _rolling_totals(results, window, zero):
+    """
+    Return a PeriodDict mapping each period onto a two-tuple of the
+    total and count of the values in its window that are not `None`.
+    """
+    values = collections.deque()
+    state = [zero, 0]
+
+    def roll(ordinal, value, expired):
+        while values and values[0][0] <= expired:
+            state[0] -= values.popleft()[1]
+            state[1] -= 1
+        if value is not None:
+            values.append((ordinal, value))
+            state[0] += value
+            state[1] += 1
+        return tuple(state)
+    return _rolling(results, window, roll)
+
+
+def _rolling_extreme(results, window, is_better):
+    """
+    Return a PeriodDict mapping each period onto the best value in its
+    window, using a monotonic deque so that each value is only added and
+    removed once.
+    """
+    candidates = collections.deque()
+
+    def roll(ordinal, value, expired):
+        while candidates and candidates[0][0] <= expired:
+            candidates.popleft()
+        if value is not None:
+            while candidates and not is_better(candidates[-1][1], value):
+                candidates.pop()
+            candidates.append((ordinal, value))
+        return candidates[0][1] if candidates else None
+    return _rolling(results, window, roll)
+
+
+def rolling_summation(results, window, zero=0):
+    """
+    Given a mapping of periods onto values, return the sum of the values
+    over the trailing window of `window` periods ending with each period.
+    """
+    totals = _rolling_totals(results, window, zero)
+    for period, (total, num_values) in totals.items():
+        totals[period] = total if num_values else zero
+    return totals
+
+
+def rolling_average(results, window):
+    """
+    Given a mapping of periods onto values, return the mean of the values
+    over the trailing window of `window` periods ending with each period,
+    or `None` if there are no values in the window.
+    """
+    totals = _rolling_totals(results, window, 0)
+    for period, (total, num_values) in totals.items():
+        totals[period] = float(total) / num_values if num_values else None
+    return totals
+
+
+def rolling_count(results, window):
+    """
+    Given a mapping of periods onto values, return the number of values that
+    are not `None` over the trailing window of `window` periods ending with
+    each period.
+    """
+    ordinals = collections.deque()
+
+    def roll(ordinal, value, expired):
+        while ordinals and ordinals[0] <= expired:
+            ordinals.popleft()
+        if value is not None:
+            ordinals.append(ordinal)
+        return len(ordinals)
+    return _rolling(results, window, roll)
+
+
+def rolling_minimum(results, window):
+    """
+    Given a mapping of periods onto values, return the smallest value
+    over the trailing window of `window` periods ending with each period,
+    or `None` if there are no values in the window.
+    """
+    return _rolling_extreme(results, window, operator.lt)
+
+
+def rolling_maximum(results, window):
+    """
+    Given a mapping of periods onto values, return the largest value
+    over the trailing window of `window` periods ending with each period,
+    or `None` if there are no values in the window.
+    """
+    return _rolling_extreme(results, window, operator.gt)
+
+
+# Time weighted functions
+#
+# These accept samples of a gauge, such as queue length or memory usage,
+# as a list of time/value pairs. Each sample's value holds until the next
+# sample, and a sample with a value of `None` marks a gap in the data.
+
+def _period_bounds(period):
+    """
+    Return a two-tuple of the start time of a period, and the start time
+    of the following period.
+    """
+    return (period.start, period.next().start)
+
+
+def time_weighted_average(periods, samples):
+    """
+    Given a sequence of time periods, and a list of time/value samples,
+    return the average value during each period, weighted by how long each
+    value held for, or `None` if no value held during the period.
+
+    The samples do not need to be sorted. Both samples and periods are
+    sorted, and then swept through together in a single pass.
+    """
+    periods = list(periods)
+    samples = sorted(samples, key=operator.itemgetter(0))
+    num_samples = len(samples)
+    position = 0
+    value = None
+    averages = {}
+    for period in sorted(set(periods), key=operator.attrgetter('start')):
+        start, stop = _period_bounds(period)
+        while position < num_samples and samples[position][0] <= start:
+            value = samples[position][1]
+            position += 1
+
+        weighted = 0
+        duration = 0
+        time, current = start, value
+        scan = position
+        while scan < num_samples and samples[scan][0] < stop:
+            if current is not None:
+                seconds = (samples[scan][0] - time).total_seconds()
+                weighted += current * seconds
+                duration += seconds
+            time, current = samples[scan]
+            scan += 1
+        if current is not None:
+            seconds = (stop - time).total_seconds()
+            weighted += current * seconds
+            duration += seconds
+        averages[period] = weighted / duration if duration else None
+    return _period_dict(periods, [averages[period] for period in periods], 0)
+
+
+def resample(periods, samples, method='previous'):
+    """
+    Given a sequence of time periods, and a list of time/value samples,
+    return the value of the samples at the start of each period.
+
+    With the 'previous' method, this is the last known value. With the
+    'linear' method, this is interpolated between the samples either side
+    of the start of the period, and after the last sample its value is
+    held, as with 'previous'. Periods without a value are mapped onto
+    `None`.
+    """
+    if method not in ('previous', 'linear'):
+        raise ValueError("method must be 'previous' or 'linear'")
+    periods = list(periods)
+    samples = sorted(samples, key=operator.itemgetter(0))
+    times = [time for time, value in samples]
+    values = []
+    for period in periods:
+        start = period.start
+        idx = bisect.bisect_right(times, start)
+        if not idx:
+            values.append(None)
+            continue
+        before_time, before = samples[idx - 1]
+        if method == 'previous' or before_time == start or before is None or idx == len(samples):
+            values.append(before)
+        elif samples[idx][1] is None:
+            values.append(None)
+        else:
+            after_time, after = samples[idx]
+            fraction = (start - before_time).total_seconds() / (after_time - before_time).total_seconds()
+            values.append(before + (after - before) * fraction)
+    return _period_dict(periods, values, 0)
+
+
+# Rollups
+
+def _span_contains(outer, inner):
+    """
+    Return True if every period with the `inner` span is contained by
+    a single period with the `outer` span.
+
+    Weeks cross month, quarter and year boundaries, so only daily and
+    shorter periods are contained by weeks, and weeks are only contained
+    by other weeks.
+    """
+    if inner == 'weekly':
+        return outer == 'weekly'
+    return _span_order[outer] >= _span_order[inner]
+
+
+class Rollup(object):
+    """
+    Aggregates data points once into periods with the given span, and
+    derives the results for periods with any coarser span by merging the
+    accumulators of the contained periods, without revisiting the data.
+
+    If the span is a time span, such as 'minute', or the data points are
+    datetimes, the results are for `TimePeriod` objects in the timezone
+    `tzinfo`, which defaults to the timezone of the first data point.
+    Otherwise the results are for `DatePeriod` objects.
+    """
+    def __init__(self, data_points, span, reducer, tzinfo=None):
+        span = _normalize_span(span, _time_spans)
+        self.span = span
+        self.reducer = reducer
+        self.tzinfo = tzinfo
+        self.num_points = 0
+        self._period_class = TimePeriod if span in _span_seconds else None
+
+        init, add = reducer.init, reducer.add
+        states = {}
+        floor = None
+        for time, value in data_points:
+            if floor is None:
+                if isinstance(time, datetime.datetime):
+                    self._period_class = TimePeriod
+                    if tzinfo is None:
+                        self.tzinfo = tzinfo = time.tzinfo
+                elif self._period_class is TimePeriod:
+                    raise ValueError("Cannot aggregate dates into '%s' periods" % span)
+                else:
+                    self._period_class = DatePeriod
+                floor = _floor_func(span, tzinfo)
+            ordinal = floor(time)
+            state = states.get(ordinal)
+            if state is None:
+                state = states[ordinal] = [0, init()]
+            state[0] += 1
+            state[1] = add(state[1], value)
+            self.num_points += 1
+        self._states = {span: states}
+
+    def _span_states(self, span):
+        """
+        Return a dictionary mapping the ordinal of each period with the
+        given span onto a two-tuple of its data point count and accumulator.
+        """
+        try:
+            return self._states[span]
+        except KeyError:
+            pass
+        if not _span_contains(span, self.span):
+            raise ValueError("Cannot roll up '%s' periods into '%s' periods" % (self.span, span))
+
+        # Merge from the longest span that has already been derived.
+        source = max(
+            [source for source in self._states if _span_contains(span, source)],
+            key=_span_order.get
+        )
+        if self._period_class is TimePeriod:
+            to_start = _ordinal_to_time
+        else:
+            to_start = _ordinal_to_date
+        to_ordinal = _ordinal_funcs[span]
+        init, merge = self.reducer.init, self.reducer.merge
+        states = {}
+        for source_ordinal, (count, accumulator) in self._states[source].items():
+            ordinal = to_ordinal(to_start(source, source_ordinal))
+            state = states.get(ordinal)
+            if state is None:
+                state = states[ordinal] = [0, init()]
+            state[0] += count
+            state[1] = merge(state[1], accumulator)
+        self._states[span] = states
+        return states
+
+    def _check_period(self, period):
+        if self._period_class is not None and not isinstance(period, self._period_class):
+            raise ValueError('Rollup contains %s results, not %s' % (
+                self._period_class.__name__, period.__class__.__name__
+            ))
+        if isinstance(period, TimePeriod):
+            expected = None if self.tzinfo is None else self.tzinfo.utcoffset(period.start)
+            if period.start.utcoffset() != expected:
+                raise ValueError('Periods must use the same timezone as the rollup')
+
+    def aggregate(self, periods):
+        """
+        Return a PeriodDict mapping each of the given periods onto its
+        aggregated value.
+        """
+        periods = list(periods)
+        finalize, init = self.reducer.finalize, self.reducer.init
+        values = []
+        seen = set()
+        num_contained = 0
+        for period in periods:
+            self._check_period(period)
+            state = self._span_states(period.span).get(period.ordinal)
+            if state is None:
+                values.append(finalize(init()))
+                continue
+            values.append(finalize(state[1]))
+            if period not in seen:
+                seen.add(period)
+                num_contained += state[0]
+        return _period_dict(periods, values, self.num_points - num_contained)
+
+    def results(self, span):
+        """
+        Return a PeriodDict mapping every period with the given span, from
+        the first period containing a data point to the last, onto its
+        aggregated value.
+        """
+        span = _normalize_span(span, _time_spans)
+        states = self._span_states(span)
+        if not states:
+            return PeriodDict()
+        period_class = self._period_class
+        first = period_class._from_ordinal(span, min(states), self.tzinfo)
+        last = period_class._from_ordinal(span, max(states), self.tzinfo)
+        return self.aggregate(PeriodRange(first, last))
+
+    def __repr__(self):
+        return '<Rollup %s %r>' % (self.span, self.reducer)
+
+
+# Streaming aggregation
+
+class StreamingAggregator(object):
+    """
+    Aggregates a stream of time/value events into time periods with the
+    given span, holding accumulators only for periods that are still open,
+    and returning each period's result once it has closed.
+
+    The watermark is the latest event time seen, less `allowed_lateness`.
+    A period closes once the watermark passes its end, after which no more
+    events are expected for it. Events for closed periods are late, and are
+    handled according to `late`, which is one of:
+
+    * 'drop' - Ignore the event. This is the default.
+    * 'raise' - Raise a ValueError.
+    * A function, which is called with the time and value of the event.
+
+    The number of late events is counted in the `late_count` attribute.
+    Periods are in the timezone `tzinfo`, which defaults to the timezone
+    of the first event.
+    """
+    def __init__(self, span, reducer, allowed_lateness=datetime.timedelta(0), tzinfo=None, late='drop'):
+        if late not in ('drop', 'raise') and not callable(late):
+            raise ValueError("late must be 'drop', 'raise' or a function")
+        self.span = _normalize_span(span, _time_spans)
+        self.reducer = reducer
+        self.allowed_lateness = allowed_lateness
+        self.tzinfo = tzinfo
+        self.late = late
+        self.late_count = 0
+        self.watermark = None
+        self._floor = None
+        self._closed_ordinal = None
+        self._open = {}
+
+    def _floor_time(self, time):
+        if self._floor is None:
+            if self.tzinfo is None:
+                self.tzinfo = time.tzinfo
+            self._floor = _floor_func(self.span, self.tzinfo)
+        return self._floor(time)
+
+    def _close(self, ordinal):
+        # Return the results for open periods before the given ordinal.
+        self._closed_ordinal = ordinal
+        closed = sorted(key for key in self._open if key < ordinal)
+        finalize = self.reducer.finalize
+        return [
+            (TimePeriod._from_ordinal(self.span, key, self.tzinfo), finalize(self._open.pop(key)))
+            for key in closed
+        ]
+
+    def advance(self, time):
+        """
+        Advance the watermark to `time`, if it is later than the current
+        watermark, and return a list of period/value pairs for the periods
+        that have closed, in chronological order.
+        """
+        if self.watermark is not None and time <= self.watermark:
+            return []
+        self.watermark = time
+        ordinal = self._floor_time(time)
+        if self._closed_ordinal is not None and ordinal <= self._closed_ordinal:
+            return []
+        return self._close(ordinal)
+
+    def add(self, time, value):
+        """
+        Add an event, and return a list of period/value pairs for the
+        periods that have closed, in chronological order.
+        """
+        ordinal = self._floor_time(time)
+        if self._closed_ordinal is not None and ordinal < self._closed_ordinal:
+            self.late_count += 1
+            if self.late == 'raise':
+                raise ValueError('Late event at %s, after the watermark %s' % (time, self.watermark))
+            elif self.late != 'drop':
+                self.late(time, value)
+            return []
+        accumulator = self._open.get(ordinal)
+        if accumulator is None:
+            accumulator = self.reducer.init()
+        self._open[ordinal] = self.reducer.add(accumulator, value)
+        return self.advance(time - self.allowed_lateness)
+
+    def add_many(self, data_points):
+        """
+        Add a sequence of time/value events, and return a list of
+        period/value pairs for the periods that have closed.
+        """
+        ret = []
+        for time, value in data_points:
+            ret.extend(self.add(time, value))
+        return ret
+
+    def flush(self):
+        """
+        Close every open period, returning a list of period/value pairs.
+        """
+        if not self._open:
+            return []
+        return self._close(max(self._open) + 1)
+
+    @property
+    def open_periods(self):
+        """
+        A list of the periods that are still open, in chronological order.
+        """
+        return [TimePeriod._from_ordinal(self.span, key, self.tzinfo) for key in sorted(self._open)]
+
+    def __repr__(self):
+        return '<StreamingAggregator %s %r>' % (self.span, self.reducer)
+
+
+# Aggregation caching
+
+class AggregationCache(object):
+    """
+    Caches the aggregated results of closed periods, so that repeatedly
+    aggregating a sliding window of periods, such as the last 24 hours,
+    only recomputes the periods that are still open or not yet cached.
+
+    Results are evicted once their period falls outside the window of
+    periods most recently requested.
+    """
+    def __init__(self, reducer):
+        self.reducer = reducer
+        self._lock = threading.Lock()
+        self._results = {}
+        self._hits = 0
+        self._misses = 0
+
+    def _is_closed(self, period, now):
+        end = period.next().start
+        if isinstance(period, DatePeriod):
+            if now is None:
+                now = DatePeriod.today_func()
+            elif isinstance(now, datetime.datetime):
+                now = now.date()
+        else:
+            if now is None:
+                now = TimePeriod.now_func()
+            # Naive datetimes are assumed to be in UTC.
+            if end.tzinfo is None and now.tzinfo is not None:
+                now = now.astimezone(_utc).replace(tzinfo=None)
+            elif end.tzinfo is not None and now.tzinfo is None:
+                now = now.replace(tzinfo=_utc)
+        return end <= now
+
+    def aggregate(self, periods, source, now=None):
+        """
+        Return a PeriodDict mapping each of the given periods onto its
+        aggregated value, using cached results for closed periods.
+
+        The `source` is either a list of date/value pairs, or a function
+        that is called with a start and end date or time, and returns the
+        data points from the start up to, but not including, the end. It
+        is only used if some of the periods are open or not yet cached.
+
+        Periods are closed once `now`, which defaults to the current time,
+        is at or after their end.
+
+        The `out_of_range` attribute of the result counts the data points
+        read that are not in any of the periods. If every period is cached
+        no data points are read, and it is zero.
+        """
+        periods = list(periods)
+        requested = set(periods)
+        with self._lock:
+            for period in list(self._results):
+                if period not in requested:
+                    del self._results[period]
+            cached = dict(self._results)
+
+        missing = [period for period in periods if period not in cached]
+        computed = {}
+        out_of_range = 0
+        if missing:
+            if callable(source):
+                time_from = min(period.start for period in missing)
+                time_until = max(period.next().start for period in missing)
+                source = source(time_from, time_until)
+            if cached:
+                source = list(source)
+            computed = aggregate(missing, source, self.reducer)
+            out_of_range = computed.out_of_range
+            if cached and out_of_range:
+                # Data points in the cached periods are out of range of the
+                # periods that were computed, but not of those requested.
+                out_of_range = count(periods, [time for time, value in source]).out_of_range
+
+        with self._lock:
+            self._hits += len(cached)
+            self._misses += len(computed)
+            for period, value in computed.items():
+                if self._is_closed(period, now):
+                    self._results[period] = value
+
+        values = [cached[period] if period in cached else computed[period] for period in periods]
+        return _period_dict(periods, values, out_of_range)
+
+    def info(self):
+        """
+        Return a `CacheInfo` named tuple of the cache statistics. There is
+        no fixed maximum size, so `maxsize` is `None`.
+        """
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, None, len(self._results))
+
+    def clear(self):
+        """
+        Remove all cached results, and reset the statistics.
+        """
+        with self._lock:
+            self._results.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def __repr__(self):
+        return '<AggregationCache %r>' % self.reducer
+
+
+# NumPy aggregation functions
+#
+# These accept arrays of timestamps and values rather than data point pairs.
+# NumPy is only imported when one of these functions is called.
+
+def _naive_utc(time):
+    """
+    Return a naive datetime in UTC, given a naive or aware datetime.
+    Naive datetimes are assumed to already be in UTC.
+    """
+    if time.tzinfo is None:
+        return time
+    return (time - time.utcoffset()).replace(tzinfo=None)
+
+
+def _numpy_bucket(periods, times):
+    """
+    Given a sequence of non-overlapping periods and an array of timestamps,
+    return a three-tuple of the numpy module, a list of the periods, and an
+    array of the index of the period containing each timestamp, or -1.
+    """
+    import numpy
+
+    periods = list(periods)
+    times = numpy.asarray(times)
+    if not periods:
+        return (numpy, periods, numpy.full(times.shape, -1, dtype=numpy.intp))
+
+    if isinstance(periods[0], DatePeriod):
+        unit = 'datetime64[D]'
+        starts = [period.start for period in periods]
+        ends = [period.end + datetime.timedelta(days=1) for period in periods]
+    else:
+        unit = 'datetime64[us]'
+        starts = [_naive_utc(period.start) for period in periods]
+        ends = [_naive_utc(period.end) for period in periods]
+
+    times = times.astype(unit)
+    starts = numpy.array(starts, dtype=unit)
+    ends = numpy.array(ends, dtype=unit)
+
+    # Duplicate periods are credited to their first occurrence, which is
+    # the one that `_period_dict()` keeps.
+    starts, order = numpy.unique(starts, return_index=True)
+    ends = ends[order]
+
+    position = numpy.searchsorted(starts, times, side='right') - 1
+    in_range = position >= 0
+    position[~in_range] = 0
+    in_range &= times < ends[position]
+
+    indices = numpy.where(in_range, order[position], -1)
+    return (numpy, periods, indices)
+
+
+def _numpy_counts(numpy, indices, num_periods):
+    return numpy.bincount(indices[indices >= 0], minlength=num_periods)
+
+
+def _numpy_sums(numpy, indices, values, num_periods):
+    """
+    Return an array of the sum of the values for each period index,
+    preserving the dtype of the values.
+    """
+    in_range = indices >= 0
+    indices = indices[in_range]
+    values = numpy.asarray(values)[in_range]
+
+    order = numpy.argsort(indices, kind='stable')
+    counts = numpy.bincount(indices, minlength=num_periods)
+    offsets = numpy.cumsum(counts) - counts
+    sums = numpy.zeros(num_periods, dtype=values.dtype)
+    non_empty = counts > 0
+    if values.size:
+        sums[non_empty] = numpy.add.reduceat(values[order], offsets[non_empty])
+    return sums
+
+
+def numpy_summation(periods, times, values, zero=0):
+    """
+    As `summation()`, but given an array of `datetime64` timestamps and
+    an array of numeric values, using NumPy.
+
+    Timestamps are compared against time periods in UTC.
+    """
+    numpy, periods, indices = _numpy_bucket(periods, times)
+    counts = _numpy_counts(numpy, indices, len(periods))
+    sums = _numpy_sums(numpy, indices, values, len(periods))
+    results = [
+        total if num else zero
+        for total, num in zip(sums.tolist(), counts.tolist())
+    ]
+    return _period_dict(periods, results, int((indices < 0).sum()))
+
+
+def numpy_average(periods, times, values):
+    """
+    As `average()`, but given an array of `datetime64` timestamps and
+    an array of numeric values, using NumPy.
+
+    Timestamps are compared against time periods in UTC.
+    """
+    numpy, periods, indices = _numpy_bucket(periods, times)
+    counts = _numpy_counts(numpy, indices, len(periods))
+    sums = _numpy_sums(numpy, indices, values, len(periods))
+    results = [
+        float(total) / num if num else None
+        for total, num in zip(sums.tolist(), counts.tolist())
+    ]
+    return _period_dict(periods, results, int((indices < 0).sum()))
+
+
+def numpy_count(periods, times):
+    """
+    As `count()`, but given an array of `datetime64` timestamps, using NumPy.
+
+    Timestamps are compared against time periods in UTC.
+    """
+    numpy, periods, indices = _numpy_bucket(periods, times)
+    counts = _numpy_counts(numpy, indices, len(periods))
+    return _period_dict(periods, counts.tolist(), int((indices < 0).sum()))
+
+
+# Bulk flooring
+#
+# Floors many timestamps at once to the ordinals or start times of their
+# containing periods, without creating a period for each timestamp.
+
+# The proleptic Gregorian ordinal of the Unix epoch, 1970-01-01.
+_epoch_ordinal = datetime.date(1970, 1, 1).toordinal()
+
+# The number of months in each period, for each calendar span.
+_months_per_period = {
+    'monthly': 1,
+    'quarterly': 3,
+    'yearly': 12,
+}
+
+
+def _month_table(first_day, last_day):
+    """
+    Return a two-tuple of the monthly ordinal of January in the year of
+    `first_day`, and a list of the first day of each month from then until
+    December in the year of `last_day`, with days counted from the epoch.
+    """
+    first_year = datetime.date.fromordinal(first_day + _epoch_ordinal).year
+    last_year = datetime.date.fromordinal(last_day + _epoch_ordinal).year
+    days = [
+        datetime.date(year, month, 1).toordinal() - _epoch_ordinal
+        for year in range(first_year, last_year + 1)
+        for month in range(1, 13)
+    ]
+    return (first_year * 12, days)
+
+
+def _fixed_offset_seconds(tz):
+    """
+    Return the UTC offset of a fixed offset timezone, in seconds.
+    """
+    if tz is None:
+        return 0
+    offset = tz.utcoffset(None)
+    if offset is None:
+        raise ValueError('Epoch timestamps can only be floored in a fixed offset timezone')
+    return (offset.days * 86400) + offset.seconds
+
+
+def _floor_epochs(timestamps, span, tz, unit, want_ordinals):
+    scale = _epoch_scale(unit)
+    offset = _fixed_offset_seconds(tz)
+    local = [int(timestamp // scale) + offset for timestamp in timestamps]
+    if not local:
+        return []
+
+    width = _span_seconds.get(span)
+    if width is not None:
+        base = _epoch_ordinal * 86400
+        ordinals = [(seconds + base) // width for seconds in local]
+
+        def start(ordinal):
+            return (ordinal * width) - base
+    elif span == 'daily':
+        ordinals = [(seconds // 86400) + _epoch_ordinal for seconds in local]
+
+        def start(ordinal):
+            return (ordinal - _epoch_ordinal) * 86400
+    elif span == 'weekly':
+        ordinals = [((seconds // 86400) + _epoch_ordinal - 1) // 7 for seconds in local]
+
+        def start(ordinal):
+            return ((ordinal * 7) + 1 - _epoch_ordinal) * 86400
+    else:
+        first_month, month_days = _month_table(min(local) // 86400, max(local) // 86400)
+        months_per_period = _months_per_period[span]
+        bisect_right = bisect.bisect_right
+        ordinals = [
+            (first_month + bisect_right(month_days, seconds // 86400) - 1) // months_per_period
+            for seconds in local
+        ]
+
+        def start(ordinal):
+            return month_days[(ordinal * months_per_period) - first_month] * 86400
+
+    if want_ordinals:
+        return ordinals
+    return [(start(ordinal) - offset) * scale for ordinal in ordinals]
+
+
+def _floor_numpy(numpy, timestamps, span, tz, unit, want_ordinals):
+    offset = _fixed_offset_seconds(tz)
+    nat = None
+    if timestamps.dtype.kind == 'M':
+        array_unit = numpy.datetime_data(timestamps.dtype)[0]
+        if array_unit not in _epoch_units:
+            array_unit = 's'
+            timestamps = timestamps.astype('datetime64[s]')
+        dtype = timestamps.dtype
+        values = timestamps.view('int64')
+        scale = _epoch_units[array_unit]
+        nat = numpy.isnat(timestamps)
+        if not nat.any():
+            nat = None
+    else:
+        dtype = None
+        scale = _epoch_scale(unit)
+        values = timestamps
+    local = numpy.floor_divide(values, scale).astype('int64') + offset
+    if not len(local):
+        return local
+    if nat is not None:
+        # NaT is stored as the minimum int64, so substitute a valid timestamp
+        # before flooring, and mark those positions in the result.
+        valid = local[~nat]
+        local[nat] = valid[0] if len(valid) else 0
+
+    width = _span_seconds.get(span)
+    day = local // 86400
+    if width is not None:
+        ordinals = (local + (_epoch_ordinal * 86400)) // width
+        starts = (ordinals * width) - (_epoch_ordinal * 86400)
+    elif span == 'daily':
+        ordinals = day + _epoch_ordinal
+        starts = day * 86400
+    elif span == 'weekly':
+        ordinals = (day + _epoch_ordinal - 1) // 7
+        starts = ((ordinals * 7) + 1 - _epoch_ordinal) * 86400
+    else:
+        first_month, month_days = _month_table(int(day.min()), int(day.max()))
+        month_days = numpy.array(month_days, dtype='int64')
+        months = first_month + numpy.searchsorted(month_days, day, side='right') - 1
+        months_per_period = _months_per_period[span]
+        ordinals = months // months_per_period
+        starts = month_days[(ordinals * months_per_period) - first_month] * 86400
+
+    if want_ordinals:
+        if nat is not None:
+            ordinals[nat] = -1
+        return ordinals
+    starts = (starts - offset) * scale
+    if nat is not None:
+        starts[nat] = numpy.iinfo('int64').min
+    return starts.view(dtype) if dtype is not None else starts
+
+
+def floor_to_span(timestamps, span, tz=None, unit=None, ordinals=False):
+    """
+    Given a sequence of timestamps, return the start of the period with
+    the given span that contains each one, or the period's ordinal if
+    `ordinals` is set.
+
+    Timestamps may be datetimes, dates, epoch timestamps in `unit`, or
+    a NumPy array of `datetime64` or epoch timestamps. Start times are of
+    the same kind as the timestamps. Periods are in the timezone `tz`,
+    which defaults to the timezone of the first datetime, or UTC for epoch
+    and NumPy timestamps, which can only use fixed offset timezones.
+    """
+    numpy = sys.modules.get('numpy')
+    if numpy is not None and isinstance(timestamps, numpy.ndarray):
+        span = _normalize_span(span, _time_spans)
+        return _floor_numpy(numpy, timestamps, span, tz, unit, ordinals)
+    elif unit is not None:
+        span = _normalize_span(span, _time_spans)
+        return _floor_epochs(timestamps, span, tz, unit, ordinals)
+
+    timestamps = list(timestamps)
+    if not timestamps:
+        return []
+    if isinstance(timestamps[0], datetime.datetime):
+        span = _normalize_span(span, _time_spans)
+        if tz is None:
+            tz = timestamps[0].tzinfo
+        floor = _floor_func(span, tz)
+    else:
+        span = _normalize_span(span, _date_spans)
+        floor = _ordinal_funcs[span]
+    floored = [floor(timestamp) for timestamp in timestamps]
+    if ordinals:
+        return floored
+
+    # Share a single start time between all the timestamps in each period.
+    starts = {}
+    for ordinal in set(floored):
+        if isinstance(timestamps[0], datetime.datetime):
+            starts[ordinal] = _ordinal_to_time(span, ordinal, tz)
+        else:
+            starts[ordinal] = _ordinal_to_date(span, ordinal)
+    return [starts[ordinal] for ordinal in floored]
@@ -1,10 +1,54 @@
 # coding: utf-8
 
+import bisect
 import collections
 import datetime
+import itertools
 import periodical
+import pickle
+import random
 import unittest
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+def allocated_bytes_per_item(factory, num_items=1000):
+    """
+    Returns the average number of bytes allocated for each item
+    returned by `factory(idx)`, while all of the items are alive.
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        items = [factory(idx) for idx in range(num_items)]
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    assert len(items) == num_items
+    return allocated / float(num_items)
+
+
+def random_data_points(start, seconds_from, seconds_until, num_points):
+    """
+    Returns a repeatable list of data points, with times between `start`
+    plus `seconds_from` and `start` plus `seconds_until`, excluding the
+    latter, and integer values between 0 and 100.
+    """
+    rand = random.Random(0)
+    return [
+        (start + datetime.timedelta(seconds=rand.randrange(seconds_from, seconds_until)), rand.randint(0, 100))
+        for idx in range(num_points)
+    ]
+
 
 class TestDatePeriods(unittest.TestCase):
 
@@ -149,6 +193,40 @@ class TestDatePeriods(unittest.TestCase):
         self.assertEqual(period.start, datetime.date(2001, 1, 1))
         self.assertEqual(period.end, datetime.date(2001, 12, 31))
 
+    # Tests for ordinals and period arithmetic
+    def test_ordinal_round_trip(self):
+        date = datetime.date(2000, 1, 1)
+        for span in ('daily', 'weekly', 'monthly', 'quarterly', 'yearly'):
+            period = periodical.DatePeriod(date=date, span=span)
+            self.assertEqual(periodical.DatePeriod.from_ordinal(span, period.ordinal), period)
+
+    def test_ordinals(self):
+        self.assertEqual(periodical.DatePeriod('2000-01-01').ordinal, datetime.date(2000, 1, 1).toordinal())
+        self.assertEqual(periodical.DatePeriod('2000-03').ordinal, 2000 * 12 + 2)
+        self.assertEqual(periodical.DatePeriod('2000-Q3').ordinal, 2000 * 4 + 2)
+        self.assertEqual(periodical.DatePeriod('2000').ordinal, 2000)
+        self.assertEqual(periodical.DatePeriod('2000-W02').ordinal - periodical.DatePeriod('2000-W01').ordinal, 1)
+
+    def test_add_and_subtract(self):
+        period = periodical.DatePeriod('2000-11')
+        self.assertEqual(period + 3, periodical.DatePeriod('2001-02'))
+        self.assertEqual(3 + period, periodical.DatePeriod('2001-02'))
+        self.assertEqual(period - 11, periodical.DatePeriod('1999-12'))
+        self.assertEqual(periodical.DatePeriod('2003-Q1') - periodical.DatePeriod('2000-Q4'), 9)
+        self.assertEqual(periodical.DatePeriod('2000-Q4') - periodical.DatePeriod('2003-Q1'), -9)
+
+    def test_add_matches_stepping(self):
+        period = periodical.DatePeriod(date=datetime.date(2000, 1, 1), span='weekly')
+        stepped = period
+        for idx in range(1000):
+            stepped = stepped.next()
+        self.assertEqual(period + 1000, stepped)
+        self.assertEqual(stepped - period, 1000)
+
+    def test_subtract_different_spans(self):
+        with self.assertRaises(ValueError):
+            periodical.DatePeriod('2000-01') - periodical.DatePeriod('2000')
+
     # Tests for date_periods_descending(), and isoformat representations
     def test_daily_series_descending(self):
         date = datetime.date(2000, 1, 1)
@@ -228,6 +306,23 @@ class TestDatePeriods(unittest.TestCase):
         reprs = [str(period) for period in periods]
         self.assertEqual(['2000'], reprs)
 
+    # Tests for iter_date_periods
+    def test_iter_date_periods(self):
+        date = datetime.date(2000, 1, 1)
+        periods = periodical.iter_date_periods(date, 'monthly', num_periods=3, descending=True)
+        self.assertEqual([str(period) for period in periods], ['2000-01', '1999-12', '1999-11'])
+        self.assertEqual(list(periodical.iter_date_periods(date, 'weekly', 5)), periodical.date_periods_ascending(date, 'weekly', 5))
+
+    def test_iter_date_periods_until(self):
+        date_from = datetime.date(2000, 1, 1)
+        date_until = datetime.date(2000, 1, 3)
+        periods = periodical.iter_date_periods(date_from, 'daily', date_until=date_until)
+        self.assertEqual([str(period) for period in periods], ['2000-01-01', '2000-01-02', '2000-01-03'])
+
+    def test_iter_date_periods_is_lazy(self):
+        periods = periodical.iter_date_periods(datetime.date(2000, 1, 1), 'daily', num_periods=10 ** 12)
+        self.assertEqual(len(list(itertools.islice(periods, 3))), 3)
+
     # Test using the current day instead of explicitly specifying
     def test_today_func(self):
         def today():
@@ -242,11 +337,40 @@ class TestDatePeriods(unittest.TestCase):
         period_repr = str(period)
         self.assertEqual(len(period_repr), 4)
 
+    @unittest.skipIf(tracemalloc is None, 'tracemalloc not available')
+    def test_memory_footprint(self):
+        # Includes the start and end dates, and the containing list's pointer.
+        start = datetime.date(2000, 1, 1)
+        factory = lambda idx: periodical.DatePeriod(date=start + datetime.timedelta(days=idx), span='daily')
+        self.assertFalse(hasattr(factory(0), '__dict__'))
+        self.assertLess(allocated_bytes_per_item(factory), 128)
+
     def test_repr(self):
         date = datetime.date(2000, 1, 1)
         cal = periodical.DatePeriod(date=date, span='monthly')
         self.assertEqual(repr(cal), "<DatePeriod '2000-01'>")
 
+    # Tests for hashing and ordering
+    def test_ordering(self):
+        periods = periodical.parse_periods(['2000-03', '2000', '2000-01', '2000-02'])
+        self.assertEqual([str(period) for period in sorted(periods)], ['2000-01', '2000-02', '2000-03', '2000'])
+        self.assertTrue(periods[2] < periods[3] <= periods[0])
+        self.assertTrue(periods[0] >= periods[3] > periods[2])
+        self.assertTrue(periods[0] != periods[2])
+
+        series = periodical.date_periods_ascending(datetime.date(2000, 1, 1), 'daily', 31)
+        self.assertEqual(bisect.bisect_left(series, periodical.DatePeriod('2000-01-15')), 14)
+
+    def test_hash(self):
+        period = periodical.DatePeriod('2000-Q4')
+        self.assertEqual(hash(period), hash(periodical.DatePeriod(date=datetime.date(2000, 11, 5), span='quarter')))
+        self.assertEqual(period, pickle.loads(pickle.dumps(period)))
+        self.assertEqual(hash(period), hash(pickle.loads(pickle.dumps(period))))
+
+    def test_invalid_date_time_ordering(self):
+        with self.assertRaises(TypeError):
+            periodical.DatePeriod('2000') < periodical.TimePeriod('2000')
+
     # Tests for bad values
     def test_invalid_period(self):
         date = datetime.date(2000, 1, 1)
@@ -267,6 +391,20 @@ class TestDatePeriods(unittest.TestCase):
         with self.assertRaises(ValueError):
             periodical.DatePeriod('199x')
 
+    def test_parse_periods(self):
+        periods = periodical.parse_periods(['2014', '2014-Q2', '2014-03', '2014-W02', '2014-04-29'])
+        reprs = [str(period) for period in periods]
+        self.assertEqual(reprs, ['2014', '2014-Q2', '2014-03', '2014-W02', '2014-04-29'])
+        self.assertEqual(periods[1].end, datetime.date(2014, 6, 30))
+
+    def test_parse_periods_invalid_kind(self):
+        with self.assertRaises(ValueError):
+            periodical.parse_periods(['2014'], kind='blibble')
+
+    def test_timezone_suffix_is_not_a_date_representation(self):
+        with self.assertRaises(ValueError):
+            periodical.DatePeriod('2014-04-29Z')
+
     def test_map(self):
         date = datetime.date(2014, 9, 1)
         periods = periodical.date_periods_ascending(date=date, span='monthly', num_periods=4)
@@ -286,6 +424,35 @@ class TestDatePeriods(unittest.TestCase):
         ])
         self.assertEqual(mapped, expected)
 
+    def test_map_unsorted_and_out_of_range(self):
+        date = datetime.date(2014, 9, 1)
+        periods = periodical.date_periods_descending(date=date, span='monthly', num_periods=2)
+        date_value_pairs = [
+            (datetime.date(2014, 9, 2), 25),
+            (datetime.date(2014, 7, 31), 10),
+            (datetime.date(2014, 8, 1), 20),
+            (datetime.date(2014, 9, 1), 30),
+            (datetime.date(2014, 10, 1), 40),
+        ]
+        mapped = periodical.map(periods, date_value_pairs)
+        expected = collections.OrderedDict([
+            (periodical.DatePeriod('2014-09'), [25, 30]),
+            (periodical.DatePeriod('2014-08'), [20]),
+        ])
+        self.assertEqual(mapped, expected)
+        self.assertEqual(mapped.out_of_range, 2)
+
+    def test_map_mixed_spans(self):
+        periods = [periodical.DatePeriod('2014-09'), periodical.DatePeriod('2014-10-01')]
+        date_value_pairs = [
+            (datetime.date(2014, 9, 2), 25),
+            (datetime.date(2014, 10, 1), 40),
+            (datetime.date(2014, 10, 2), 50),
+        ]
+        mapped = periodical.map(periods, date_value_pairs)
+        self.assertEqual(list(mapped.values()), [[25], [40]])
+        self.assertEqual(mapped.out_of_range, 1)
+
     def test_summation(self):
         date = datetime.date(2014, 9, 1)
         periods = periodical.date_periods_ascending(date=date, span='monthly', num_periods=4)
@@ -434,6 +601,18 @@ class TestTimePeriods(unittest.TestCase):
         self.assertTrue(period.contains(periodical.utc_datetime(2000, 1, 1)))
         self.assertFalse(period.contains(periodical.utc_datetime(2000, 2, 1)))
 
+    def test_yearly_offset_repr(self):
+        period = periodical.TimePeriod('2014-05:00')
+        self.assertEqual(period.span, 'yearly')
+        self.assertEqual(str(period), '2014-05:00')
+
+    def test_parse_periods(self):
+        periods = periodical.parse_periods(['2014Z', '2014-04-29T15Z', '2014-04-29T15:34', '2014-04-29T15:34:24-05:00'], kind='time')
+        reprs = [str(period) for period in periods]
+        self.assertEqual(reprs, ['2014Z', '2014-04-29T15:00Z', '2014-04-29T15:34', '2014-04-29T15:34:24-05:00'])
+        self.assertEqual(periods[1].span, 'hours')
+        self.assertEqual(periods[3].span, 'seconds')
+
     # Tests for `.previous()`
     def test_seconds_previous(self):
         time = datetime.datetime(2000, 1, 31, 23, 59, 59)
@@ -554,6 +733,37 @@ class TestTimePeriods(unittest.TestCase):
         self.assertEqual(period.start, datetime.datetime(2001, 1, 1))
         self.assertEqual(period.end, datetime.datetime(2002, 1, 1))
 
+    # Tests for ordinals and period arithmetic
+    def test_ordinal_round_trip(self):
+        time = datetime.datetime(2000, 1, 1, 12, 34, 56, tzinfo=periodical.Offset('-05:00'))
+        for span in ('seconds', 'minutes', 'hours', 'daily', 'weekly', 'monthly', 'quarterly', 'yearly'):
+            period = periodical.TimePeriod(time=time, span=span)
+            from_ordinal = periodical.TimePeriod.from_ordinal(span, period.ordinal, time.tzinfo)
+            self.assertEqual(from_ordinal, period)
+            self.assertEqual(str(from_ordinal), str(period))
+
+    def test_ordinals_nest(self):
+        time = datetime.datetime(2000, 1, 1, 12, 34, 56)
+        hour = periodical.TimePeriod(time=time, span='hour')
+        day = periodical.TimePeriod(time=time, span='day')
+        self.assertEqual(hour.ordinal // 24, day.ordinal)
+
+    def test_add_and_subtract(self):
+        period = periodical.TimePeriod('2000-12-31T23Z')
+        self.assertEqual(period + 2, periodical.TimePeriod('2001-01-01T01Z'))
+        self.assertEqual(period - 24, periodical.TimePeriod('2000-12-30T23Z'))
+        self.assertEqual(periodical.TimePeriod('2001-01-01T01Z') - period, 2)
+        self.assertEqual(str(periodical.TimePeriod('2000-01-05:00') + 13), '2001-02-05:00')
+
+    def test_subtract_different_timezones(self):
+        with self.assertRaises(ValueError):
+            periodical.TimePeriod('2000-01-01T05Z') - periodical.TimePeriod('2000-01-01T00-05:00')
+
+    def test_end_excludes_microseconds(self):
+        time = datetime.datetime(2000, 1, 1, 12, 34, 56, 789)
+        period = periodical.TimePeriod(time=time, span='seconds')
+        self.assertEqual(period.end, datetime.datetime(2000, 1, 1, 12, 34, 57))
+
     # Tests for date_periods_descending(), and isoformat representations
     def test_offset_second_series_descending(self):
         time = datetime.datetime(2000, 1, 1, 23, 00, 00, tzinfo=periodical.Offset('+01:30'))
@@ -651,6 +861,24 @@ class TestTimePeriods(unittest.TestCase):
         reprs = [str(period) for period in periods]
         self.assertEqual(['2000'], reprs)
 
+    # Tests for iter_time_periods
+    def test_iter_time_periods(self):
+        time = periodical.utc_datetime(2000, 1, 1)
+        periods = periodical.iter_time_periods(time, 'hours', num_periods=2, descending=True)
+        self.assertEqual([str(period) for period in periods], ['2000-01-01T00:00Z', '1999-12-31T23:00Z'])
+        self.assertEqual(list(periodical.iter_time_periods(time, 'minutes', 5)), periodical.time_periods_ascending(time, 'minutes', 5))
+
+    def test_iter_time_periods_until(self):
+        time_from = periodical.utc_datetime(2000, 1, 1, 3)
+        time_until = datetime.datetime(2000, 1, 1, tzinfo=periodical.Offset('+01:00'))
+        periods = periodical.iter_time_periods(time_from, 'hours', time_until=time_until)
+        reprs = [str(period) for period in periods]
+        self.assertEqual(reprs, ['2000-01-01T03:00Z', '2000-01-01T02:00Z', '2000-01-01T01:00Z', '2000-01-01T00:00Z', '1999-12-31T23:00Z'])
+
+    def test_iter_time_periods_is_lazy(self):
+        periods = periodical.iter_time_periods(periodical.utc_datetime(2000, 1, 1), 'seconds', num_periods=10 ** 12)
+        self.assertEqual(len(list(itertools.islice(periods, 3))), 3)
+
     # Test using the current time instead of explicitly specifying
     def test_now_func(self):
         def now():
@@ -665,11 +893,38 @@ class TestTimePeriods(unittest.TestCase):
         self.assertEqual(len(period_repr), 5)
         self.assertEqual(period_repr[-1], 'Z')
 
+    @unittest.skipIf(tracemalloc is None, 'tracemalloc not available')
+    def test_memory_footprint(self):
+        # Includes the start and end times, and the containing list's pointer.
+        start = periodical.utc_datetime(2000, 1, 1)
+        factory = lambda idx: periodical.TimePeriod(time=start + datetime.timedelta(minutes=idx), span='minutes')
+        self.assertFalse(hasattr(factory(0), '__dict__'))
+        self.assertLess(allocated_bytes_per_item(factory), 192)
+
     def test_repr(self):
         time = datetime.datetime(2000, 1, 1)
         cal = periodical.TimePeriod(time=time, span='monthly')
         self.assertEqual(repr(cal), "<TimePeriod '2000-01'>")
 
+    # Tests for hashing and ordering
+    def test_ordering(self):
+        periods = periodical.parse_periods(['2000-01-01T02Z', '2000-01-01T01Z', '2000-01-01Z', '2000-01-01T01:30Z'], kind='time')
+        self.assertEqual(
+            [str(period) for period in sorted(periods)],
+            ['2000-01-01T01:30Z', '2000-01-01T01:00Z', '2000-01-01T02:00Z', '2000-01-01Z']
+        )
+        self.assertEqual(min(periods[:2]), periods[1])
+
+    def test_hash_across_timezones(self):
+        utc = periodical.TimePeriod('2000-01-01T05Z')
+        est = periodical.TimePeriod('2000-01-01T00-05:00')
+        self.assertEqual(utc, est)
+        self.assertEqual(hash(utc), hash(est))
+        self.assertEqual(str(pickle.loads(pickle.dumps(est))), '2000-01-01T00:00-05:00')
+
+    def test_quarterly_str(self):
+        self.assertEqual(str(periodical.TimePeriod('2000-Q4Z')), '2000-Q4Z')
+
     # Tests for bad values
     def test_invalid_period(self):
         time = datetime.datetime(2000, 1, 1)
@@ -737,6 +992,24 @@ class TestTimePeriods(unittest.TestCase):
     #     ])
     #     self.assertEqual(averages, expected)
 
+    def test_map_timezones(self):
+        start = periodical.TimePeriod('2014-09-01T00Z')
+        periods = periodical.PeriodRange(start, start + 2)
+        date_value_pairs = [
+            (periodical.utc_datetime(2014, 9, 1, 0, 30), 1),
+            (datetime.datetime(2014, 8, 31, 21, 15, tzinfo=periodical.Offset('-05:00')), 2),
+            (periodical.utc_datetime(2014, 9, 1, 3), 3),
+            (periodical.utc_datetime(2014, 8, 31, 23, 59), 4),
+        ]
+        mapped = periodical.map(periods, date_value_pairs)
+        expected = collections.OrderedDict([
+            (periodical.TimePeriod('2014-09-01T00Z'), [1]),
+            (periodical.TimePeriod('2014-09-01T01Z'), []),
+            (periodical.TimePeriod('2014-09-01T02Z'), [2]),
+        ])
+        self.assertEqual(mapped, expected)
+        self.assertEqual(mapped.out_of_range, 2)
+
     def test_count(self):
         time = periodical.utc_datetime(2014, 9, 1)
         periods = periodical.time_periods_ascending(time=time, span='monthly', num_periods=4)
@@ -756,5 +1029,1039 @@ class TestTimePeriods(unittest.TestCase):
         ])
         self.assertEqual(counts, expected)
 
+
+class TestPeriodCache(unittest.TestCase):
+    def test_same_instance(self):
+        cache = periodical.PeriodCache()
+        period = cache.date_period('2014-Q1')
+        self.assertIs(cache.date_period('2014-Q1'), period)
+        self.assertEqual(period, periodical.DatePeriod('2014-Q1'))
+
+        date = datetime.date(2014, 1, 5)
+        period = cache.date_period(date=date, span='weekly')
+        self.assertIs(cache.date_period(date=date, span='weekly'), period)
+        self.assertEqual(cache.info(), periodical.CacheInfo(hits=2, misses=2, maxsize=1024, currsize=2))
+
+    def test_dates_within_a_period_share_an_instance(self):
+        cache = periodical.PeriodCache()
+        period = cache.date_period(date=datetime.date(2014, 1, 5), span='month')
+        self.assertIs(cache.date_period(date=datetime.date(2014, 1, 28), span='monthly'), period)
+        self.assertEqual(period, periodical.DatePeriod('2014-01'))
+
+        period = cache.time_period(time=periodical.utc_datetime(2014, 1, 1, 4, 15), span='hour')
+        self.assertIs(cache.time_period(time=periodical.utc_datetime(2014, 1, 1, 4, 45), span='hourly'), period)
+        self.assertEqual(cache.info(), periodical.CacheInfo(hits=2, misses=2, maxsize=1024, currsize=2))
+
+    def test_representations_share_an_instance(self):
+        cache = periodical.PeriodCache()
+        period = cache.date_period('2014-05')
+        self.assertIs(cache.date_period(date=datetime.date(2014, 5, 3), span='monthly'), period)
+        period = cache.time_period('2014-05-01T10Z')
+        self.assertIs(cache.time_period(time=periodical.utc_datetime(2014, 5, 1, 10, 20), span='hour'), period)
+        self.assertEqual(cache.info(), periodical.CacheInfo(hits=2, misses=2, maxsize=1024, currsize=2))
+
+    def test_timezones_are_cached_separately(self):
+        cache = periodical.PeriodCache()
+        utc = cache.time_period(time=periodical.utc_datetime(2014, 1, 1, 4), span='hour')
+        est = cache.time_period(time=datetime.datetime(2013, 12, 31, 23, tzinfo=periodical.Offset('-05:00')), span='hour')
+        self.assertEqual(str(utc), '2014-01-01T04:00Z')
+        self.assertEqual(str(est), '2013-12-31T23:00-05:00')
+
+    def test_maxsize(self):
+        cache = periodical.PeriodCache(maxsize=2)
+        first = cache.time_period('2014-01-01T04Z')
+        cache.time_period('2014-01-01T05Z')
+        cache.time_period('2014-01-01T04Z')
+        cache.time_period('2014-01-01T06Z')
+        self.assertIs(cache.time_period('2014-01-01T04Z'), first)
+        self.assertEqual(cache.info().currsize, 2)
+        self.assertEqual(cache.info().hits, 2)
+
+        cache.maxsize = 1
+        self.assertEqual(cache.info().currsize, 1)
+        cache.clear()
+        self.assertEqual(cache.info(), periodical.CacheInfo(hits=0, misses=0, maxsize=1, currsize=0))
+
+    def test_invalid_maxsize(self):
+        with self.assertRaises(ValueError):
+            periodical.PeriodCache(maxsize=-1)
+
+
+class TestPeriodRange(unittest.TestCase):
+    def setUp(self):
+        start = periodical.TimePeriod('2000-01-01T00Z')
+        self.period_range = periodical.PeriodRange(start, start + 9)
+        self.periods = periodical.time_periods_ascending(start.start, 'hour', 10)
+
+    def test_sequence(self):
+        self.assertEqual(len(self.period_range), 10)
+        self.assertEqual(list(self.period_range), self.periods)
+        self.assertEqual(list(reversed(self.period_range)), self.periods[::-1])
+        self.assertEqual(self.period_range[3], self.periods[3])
+        self.assertEqual(self.period_range[-1], self.periods[-1])
+        with self.assertRaises(IndexError):
+            self.period_range[10]
+
+    def test_slicing(self):
+        for start in (None, -12, -3, 0, 2, 9, 15):
+            for stop in (None, -12, -3, 0, 2, 9, 15):
+                for step in (None, 1, 3, -1, -4):
+                    sliced = self.period_range[start:stop:step]
+                    self.assertEqual(list(sliced), self.periods[start:stop:step])
+                    self.assertEqual(len(sliced), len(self.periods[start:stop:step]))
+
+    def test_descending(self):
+        period_range = periodical.PeriodRange(periodical.DatePeriod('2000-03'), periodical.DatePeriod('1999-11'))
+        self.assertEqual([str(period) for period in period_range], ['2000-03', '2000-02', '2000-01', '1999-12', '1999-11'])
+        self.assertEqual(period_range.index(periodical.DatePeriod('1999-12')), 3)
+        self.assertEqual(period_range.index_of(datetime.date(2000, 2, 29)), 1)
+
+    def test_contains(self):
+        self.assertIn(periodical.TimePeriod('2000-01-01T05Z'), self.period_range)
+        self.assertIn(periodical.TimePeriod('2000-01-01T00-05:00'), self.period_range)
+        self.assertNotIn(periodical.TimePeriod('2000-01-01T10Z'), self.period_range)
+        self.assertNotIn(periodical.TimePeriod('2000-01-01Z'), self.period_range)
+        self.assertNotIn(periodical.TimePeriod('2000-01-01T01Z'), self.period_range[::2])
+
+    def test_index_of(self):
+        self.assertEqual(self.period_range.index_of(periodical.utc_datetime(2000, 1, 1, 4, 59, 59)), 4)
+        time = datetime.datetime(1999, 12, 31, 21, 30, tzinfo=periodical.Offset('-05:00'))
+        self.assertEqual(self.period_range.index_of(time), 2)
+        with self.assertRaises(ValueError):
+            self.period_range.index_of(periodical.utc_datetime(2000, 1, 1, 10))
+
+    def test_equality_and_repr(self):
+        start = periodical.TimePeriod('2000-01-01T00Z')
+        self.assertEqual(self.period_range, periodical.PeriodRange(start, start + 9))
+        self.assertNotEqual(self.period_range, periodical.PeriodRange(start, start + 8))
+        self.assertEqual(repr(self.period_range), "<PeriodRange [<TimePeriod '2000-01-01T00:00Z'>, ..., <TimePeriod '2000-01-01T09:00Z'>]>")
+
+
+class TestReducers(unittest.TestCase):
+    def setUp(self):
+        self.periods = periodical.date_periods_ascending(datetime.date(2014, 9, 1), 'monthly', 3)
+        self.data_points = [
+            (datetime.date(2014, 9, 1), 20),
+            (datetime.date(2014, 9, 2), 25),
+            (datetime.date(2014, 9, 30), 3),
+            (datetime.date(2014, 11, 1), 30),
+        ]
+
+    def reduce(self, reducer):
+        return list(periodical.aggregate(self.periods, self.data_points, reducer).values())
+
+    def test_builtin_reducers(self):
+        self.assertEqual(self.reduce(periodical.Sum()), [48, 0, 30])
+        self.assertEqual(self.reduce(periodical.Sum(zero=0.0)), [48.0, 0.0, 30.0])
+        self.assertEqual(self.reduce(periodical.Count()), [3, 0, 1])
+        self.assertEqual(self.reduce(periodical.Mean()), [16.0, None, 30.0])
+        self.assertEqual(self.reduce(periodical.Min()), [3, None, 30])
+        self.assertEqual(self.reduce(periodical.Max()), [25, None, 30])
+
+        variances = self.reduce(periodical.Variance())
+        self.assertAlmostEqual(variances[0], 266 / 3.0)
+        self.assertEqual(variances[1:], [None, 0.0])
+        sample_variances = self.reduce(periodical.Variance(ddof=1))
+        self.assertAlmostEqual(sample_variances[0], 133.0)
+        self.assertEqual(sample_variances[1:], [None, None])
+
+    def test_merge(self):
+        rand = random.Random(0)
+        values = [rand.uniform(-100, 100) for idx in range(100)]
+        reducers = [
+            periodical.Sum(), periodical.Count(), periodical.Mean(),
+            periodical.Min(), periodical.Max(), periodical.Variance()
+        ]
+        for reducer in reducers:
+            whole = reducer.init()
+            for value in values:
+                whole = reducer.add(whole, value)
+            for split in (0, 1, 50, 100):
+                left, right = reducer.init(), reducer.init()
+                for value in values[:split]:
+                    left = reducer.add(left, value)
+                for value in values[split:]:
+                    right = reducer.add(right, value)
+                merged = reducer.merge(left, right)
+                self.assertAlmostEqual(reducer.finalize(merged), reducer.finalize(whole))
+
+    def test_describe(self):
+        stats = list(periodical.describe(self.periods, self.data_points).values())
+        self.assertEqual(stats[0][:5], (3, 48, 3, 25, 16.0))
+        self.assertAlmostEqual(stats[0].stddev, (266 / 3.0) ** 0.5)
+        self.assertEqual(stats[1], periodical.Statistics(0, 0, None, None, None, None))
+        self.assertEqual(stats[2], periodical.Statistics(1, 30, 30, 30, 30.0, 0.0))
+        sample = list(periodical.describe(self.periods, self.data_points, ddof=1).values())
+        self.assertAlmostEqual(sample[0].stddev, 133.0 ** 0.5)
+        self.assertEqual(sample[2].stddev, None)
+
+    def test_describe_merge_empty(self):
+        reducer = periodical.Describe()
+        merged = reducer.merge(reducer.init(), reducer.init())
+        self.assertEqual(reducer.finalize(merged), periodical.Statistics(0, 0, None, None, None, None))
+
+        accumulator = reducer.init()
+        for value in (3, 20, 25):
+            accumulator = reducer.add(accumulator, value)
+        expected = reducer.finalize(accumulator)
+        self.assertEqual(reducer.finalize(reducer.merge(reducer.init(), accumulator)), expected)
+        self.assertEqual(reducer.finalize(reducer.merge(accumulator, reducer.init())), expected)
+        self.assertEqual(expected[:5], (3, 48, 3, 25, 16.0))
+
+    def test_aggregate_batches(self):
+        consumed = []
+
+        def batches():
+            for idx in range(0, len(self.data_points), 2):
+                batch = iter(self.data_points[idx:idx + 2])
+                consumed.append(batch)
+                # The previous batch must be exhausted before the next is requested.
+                for previous in consumed[:-1]:
+                    self.assertEqual(next(previous, None), None)
+                yield batch
+
+        results = periodical.aggregate_batches(self.periods, batches(), periodical.Sum())
+        self.assertEqual(list(results.values()), [48, 0, 30])
+        self.assertEqual(len(consumed), 2)
+
+        results = periodical.aggregate(self.periods, iter(self.data_points + [(datetime.date(2015, 1, 1), 1)]), periodical.Sum())
+        self.assertEqual(list(results.values()), [48, 0, 30])
+        self.assertEqual(results.out_of_range, 1)
+
+    def test_aggregate_grouped(self):
+        data_points = [
+            (datetime.date(2014, 9, 1), '/home', 20),
+            (datetime.date(2014, 9, 2), '/login', 25),
+            (datetime.date(2014, 9, 30), '/home', 3),
+            (datetime.date(2014, 11, 1), '/login', 30),
+            (datetime.date(2015, 1, 1), '/home', 1),
+        ]
+        results = periodical.aggregate_grouped(self.periods, data_points, periodical.Mean())
+        self.assertEqual(list(results.values()), [
+            collections.OrderedDict([('/home', 11.5), ('/login', 25.0)]),
+            collections.OrderedDict([('/home', None), ('/login', None)]),
+            collections.OrderedDict([('/home', None), ('/login', 30.0)]),
+        ])
+        self.assertEqual(results.out_of_range, 1)
+
+        by_group = collections.defaultdict(list)
+        for date, group, value in data_points:
+            by_group[group].append((date, value))
+        results = periodical.aggregate_grouped(self.periods, data_points, periodical.Sum())
+        for group, group_data_points in by_group.items():
+            expected = periodical.summation(self.periods, group_data_points)
+            self.assertEqual([row[group] for row in results.values()], list(expected.values()))
+
+    def test_custom_reducer(self):
+        class Last(periodical.Reducer):
+            def init(self):
+                return None
+
+            def add(self, accumulator, value):
+                return value
+
+            def merge(self, accumulator, other):
+                return accumulator if other is None else other
+
+        self.assertEqual(self.reduce(Last()), [3, None, 30])
+
+    def test_reducer_must_be_implemented(self):
+        with self.assertRaises(NotImplementedError):
+            periodical.aggregate(self.periods, self.data_points, periodical.Reducer())
+
+
+class TestQuantileSketch(unittest.TestCase):
+    def exact_quantile(self, values, q):
+        return sorted(values)[int(q * (len(values) - 1))]
+
+    def test_relative_accuracy(self):
+        rand = random.Random(0)
+        values = [rand.lognormvariate(0, 2) for idx in range(10000)]
+        values += [-value for value in values[:1000]] + [0] * 100
+        sketch = periodical.QuantileSketch(relative_accuracy=0.01)
+        for value in values:
+            sketch.add(value)
+        self.assertEqual(len(sketch), len(values))
+        for q in (0, 0.01, 0.05, 0.1, 0.5, 0.9, 0.95, 0.99, 1):
+            expected = self.exact_quantile(values, q)
+            self.assertTrue(abs(sketch.quantile(q) - expected) <= abs(expected) * 0.01)
+        self.assertEqual(sketch.quantile(0), min(values))
+        self.assertEqual(sketch.quantile(1), max(values))
+
+    def test_empty(self):
+        sketch = periodical.QuantileSketch()
+        self.assertEqual(sketch.quantile(0.5), None)
+        with self.assertRaises(ValueError):
+            sketch.quantile(1.5)
+        with self.assertRaises(ValueError):
+            periodical.QuantileSketch(relative_accuracy=0)
+
+    def test_max_bins(self):
+        rand = random.Random(0)
+        values = [rand.uniform(0.001, 1000) for idx in range(10000)]
+        sketch = periodical.QuantileSketch(relative_accuracy=0.01, max_bins=64)
+        for value in values:
+            sketch.add(value)
+        self.assertTrue(len(sketch._positive) <= 64)
+        for q in (0.95, 0.99):
+            expected = self.exact_quantile(values, q)
+            self.assertTrue(abs(sketch.quantile(q) - expected) <= expected * 0.01)
+
+    def test_merge(self):
+        rand = random.Random(0)
+        values = [rand.expovariate(0.01) for idx in range(1000)]
+        whole = periodical.QuantileSketch()
+        left, right = periodical.QuantileSketch(), periodical.QuantileSketch()
+        for idx, value in enumerate(values):
+            whole.add(value)
+            (left if idx % 3 else right).add(value)
+        merged = left.merge(right)
+        for q in (0, 0.5, 0.95, 0.99, 1):
+            self.assertEqual(merged.quantile(q), whole.quantile(q))
+        with self.assertRaises(ValueError):
+            merged.merge(periodical.QuantileSketch(relative_accuracy=0.05))
+
+    def test_quantiles(self):
+        start = periodical.utc_datetime(2014, 1, 1)
+        periods = periodical.time_periods_ascending(start, 'hour', 3)
+        data_points = [(start + datetime.timedelta(minutes=idx), idx % 60 + 1) for idx in range(120)]
+        results = periodical.quantiles(periods, data_points, qs=(0.5, 0.99))
+        self.assertEqual(list(results[periods[0]].keys()), [0.5, 0.99])
+        self.assertAlmostEqual(results[periods[0]][0.5], 30, delta=0.3)
+        self.assertAlmostEqual(results[periods[1]][0.99], 59, delta=0.59)
+        self.assertEqual(results[periods[2]], None)
+
+    def test_hourly_sketches_merge_into_daily(self):
+        start = periodical.utc_datetime(2014, 1, 1)
+        rand = random.Random(0)
+        data_points = [
+            (start + datetime.timedelta(seconds=rand.randrange(86400)), rand.expovariate(0.01))
+            for idx in range(2000)
+        ]
+        hourly = periodical.quantile_sketches(periodical.time_periods_ascending(start, 'hour', 24), data_points)
+        daily = periodical.QuantileSketch()
+        for sketch in hourly.values():
+            daily.merge(sketch)
+        direct = periodical.quantile_sketches([periodical.TimePeriod(time=start, span='day')], data_points)
+        direct = list(direct.values())[0]
+        self.assertEqual(daily.count, 2000)
+        for q in (0.5, 0.95, 0.99):
+            self.assertEqual(daily.quantile(q), direct.quantile(q))
+
+
+class TestHyperLogLog(unittest.TestCase):
+    def test_exact_for_small_cardinalities(self):
+        sketch = periodical.HyperLogLog(precision=12)
+        for idx in range(1000):
+            sketch.add('user-%d' % (idx % 200))
+        self.assertEqual(sketch.count(), 200)
+        self.assertEqual(sketch._registers, None)
+
+    def test_error_bound(self):
+        sketch = periodical.HyperLogLog(precision=12)
+        self.assertAlmostEqual(sketch.error, 0.01625)
+        for num_values in (1000, 50000):
+            sketch = periodical.HyperLogLog(precision=12)
+            for idx in range(num_values):
+                sketch.add(idx)
+            self.assertTrue(abs(sketch.count() - num_values) <= num_values * sketch.error * 3)
+
+    def test_stable_hash(self):
+        # Sketches built in different processes can only be merged if
+        # these values never change.
+        self.assertEqual(periodical._stable_hash('abc'), 1904408888639333651)
+        self.assertEqual(periodical._stable_hash(b'abc'), 16651944625392898821)
+        self.assertEqual(periodical._stable_hash(1), 3933635514243602867)
+        self.assertNotEqual(periodical._stable_hash('1'), periodical._stable_hash(1))
+
+    def test_equal_numbers_are_one_value(self):
+        sketch = periodical.HyperLogLog()
+        for value in (1, 1.0, True, 1.5, 2):
+            sketch.add(value)
+        self.assertEqual(sketch.count(), 3)
+
+    def test_merge(self):
+        whole = periodical.HyperLogLog(precision=10)
+        exact, large = periodical.HyperLogLog(precision=10), periodical.HyperLogLog(precision=10)
+        for idx in range(5000):
+            whole.add(idx)
+            (exact if idx < 20 else large).add(idx)
+        merged = exact.merge(large)
+        self.assertEqual(merged.count(), whole.count())
+        small = periodical.HyperLogLog(precision=10)
+        small.add(1)
+        merged.merge(small)
+        self.assertEqual(merged.count(), whole.count())
+        with self.assertRaises(ValueError):
+            whole.merge(periodical.HyperLogLog(precision=12))
+        with self.assertRaises(ValueError):
+            periodical.HyperLogLog(precision=20)
+
+    def test_distinct_count(self):
+        periods = periodical.date_periods_ascending(datetime.date(2014, 9, 1), 'monthly', 3)
+        data_points = [
+            (datetime.date(2014, 9, 1), 'alice'),
+            (datetime.date(2014, 9, 2), 'bob'),
+            (datetime.date(2014, 9, 30), 'alice'),
+            (datetime.date(2014, 11, 1), 'carol'),
+        ]
+        self.assertEqual(list(periodical.distinct_count(periods, data_points).values()), [2, 0, 1])
+
+    def test_daily_sketches_merge_into_weekly_and_monthly(self):
+        rand = random.Random(0)
+        start = datetime.date(2014, 9, 1)
+        data_points = [
+            (start + datetime.timedelta(days=rand.randrange(30)), 'user-%d' % rand.randrange(20000))
+            for idx in range(50000)
+        ]
+        days = periodical.date_periods_ascending(start, 'daily', 30)
+        daily = periodical.distinct_sketches(days, data_points)
+        for span in ('weekly', 'monthly'):
+            coarse = periodical.date_periods_between(start, start + datetime.timedelta(days=29), span)
+            direct = periodical.distinct_count(coarse, data_points)
+            for period in coarse:
+                merged = periodical.HyperLogLog()
+                for day in days:
+                    if period.contains(day.start):
+                        merged.merge(daily[day])
+                self.assertEqual(merged.count(), direct[period])
+
+
+class TestRollup(unittest.TestCase):
+    def setUp(self):
+        self.data_points = random_data_points(periodical.utc_datetime(2014, 1, 1), 0, 86400 * 40, 5000)
+
+    def test_time_rollup_matches_direct_aggregation(self):
+        rollup = periodical.Rollup(self.data_points, 'minute', periodical.Sum())
+        # Months are derived before weeks, which must still be derived from days.
+        for span in ('minute', 'hour', 'day', 'month', 'quarter', 'year', 'week'):
+            results = rollup.results(span)
+            self.assertEqual(results, periodical.summation(list(results.keys()), self.data_points))
+            self.assertEqual(results.out_of_range, 0)
+        self.assertEqual(list(rollup.results('year').values()), [sum(value for time, value in self.data_points)])
+
+    def test_date_rollup(self):
+        data_points = [(time.date(), value) for time, value in self.data_points]
+        rollup = periodical.Rollup(data_points, 'daily', periodical.Mean())
+        weeks = periodical.date_periods_ascending(datetime.date(2014, 1, 1), 'weekly', 4)
+        results = rollup.aggregate(weeks)
+        expected = periodical.average(weeks, data_points)
+        for period in weeks:
+            self.assertAlmostEqual(results[period], expected[period])
+        self.assertEqual(results.out_of_range, expected.out_of_range)
+        self.assertTrue(isinstance(list(rollup.results('month').keys())[0], periodical.DatePeriod))
+
+    def test_timezone(self):
+        tzinfo = periodical.Offset('+05:30')
+        rollup = periodical.Rollup(self.data_points, 'hour', periodical.Count(), tzinfo=tzinfo)
+        results = rollup.results('day')
+        self.assertEqual(list(results.keys())[0], periodical.TimePeriod('2014-01-01+05:30'))
+        self.assertEqual(results, periodical.count(list(results.keys()), [time for time, value in self.data_points]))
+        with self.assertRaises(ValueError):
+            rollup.aggregate([periodical.TimePeriod('2014-01-01Z')])
+
+    def test_span_containment(self):
+        rollup = periodical.Rollup(self.data_points, 'week', periodical.Sum())
+        self.assertEqual(len(rollup.results('week')), 6)
+        for span in ('day', 'month', 'year'):
+            with self.assertRaises(ValueError):
+                rollup.results(span)
+        with self.assertRaises(ValueError):
+            rollup.aggregate([periodical.DatePeriod('2014-W02')])
+
+    def test_dates_into_time_span(self):
+        data_points = [(time.date(), value) for time, value in self.data_points]
+        with self.assertRaises(ValueError):
+            periodical.Rollup(data_points, 'hour', periodical.Count())
+
+    def test_empty(self):
+        rollup = periodical.Rollup([], 'day', periodical.Sum())
+        self.assertEqual(rollup.results('month'), periodical.PeriodDict())
+        results = rollup.aggregate([periodical.DatePeriod('2014-01')])
+        self.assertEqual(list(results.values()), [0])
+
+
+class TestParallelAggregation(unittest.TestCase):
+    def setUp(self):
+        start = periodical.utc_datetime(2014, 1, 1)
+        self.periods = periodical.time_periods_ascending(start, 'hour', 24)
+        self.data_points = random_data_points(start, 0, 86400 + 3600, 5000)
+
+    def test_results_match_serial(self):
+        serial = periodical.summation(self.periods, self.data_points)
+        parallel = periodical.summation(self.periods, self.data_points, workers=3)
+        self.assertEqual(parallel, serial)
+        self.assertEqual(parallel.out_of_range, serial.out_of_range)
+        self.assertTrue(parallel.out_of_range > 0)
+
+        periods = periodical.PeriodRange(self.periods[0], self.periods[-1])
+        serial = periodical.describe(periods, self.data_points)
+        parallel = periodical.describe(iter(periods), self.data_points, workers=2)
+        self.assertEqual(list(parallel.keys()), list(serial.keys()))
+        for period in periods:
+            self.assertEqual(parallel[period][:4], serial[period][:4])
+            self.assertAlmostEqual(parallel[period].stddev, serial[period].stddev)
+
+        times = [time for time, value in self.data_points]
+        serial = periodical.count(self.periods, times)
+        parallel = periodical.count(self.periods, times, workers=2)
+        self.assertEqual(parallel, serial)
+        self.assertEqual(parallel.out_of_range, serial.out_of_range)
+
+    def test_fewer_data_points_than_workers(self):
+        data_points = self.data_points[:1]
+        self.assertEqual(
+            periodical.summation(self.periods, data_points, workers=4),
+            periodical.summation(self.periods, data_points)
+        )
+
+    def test_invalid_workers(self):
+        with self.assertRaises(ValueError):
+            periodical.summation(self.periods, self.data_points, workers=0)
+
+
+class TestSortedAggregation(unittest.TestCase):
+    def setUp(self):
+        start = periodical.utc_datetime(2014, 1, 1)
+        self.periods = periodical.time_periods_descending(start + datetime.timedelta(hours=23), 'hour', 24)
+        self.data_points = random_data_points(start, -3600, 86400 + 3600, 3000)
+
+    def test_assume_sorted(self):
+        data_points = sorted(self.data_points, key=lambda pair: pair[0])
+        expected = periodical.summation(self.periods, data_points)
+        results = periodical.aggregate(self.periods, iter(data_points), periodical.Sum(), assume_sorted=True)
+        self.assertEqual(results, expected)
+        self.assertEqual(list(results.keys()), self.periods)
+        self.assertEqual(results.out_of_range, expected.out_of_range)
+        with self.assertRaises(ValueError):
+            periodical.aggregate(self.periods, self.data_points, periodical.Sum(), assume_sorted=True)
+
+    def test_mixed_periods(self):
+        periods = [periodical.TimePeriod('2014-01-01T00Z'), periodical.TimePeriod('2014-01-01Z')]
+        with self.assertRaises(ValueError):
+            periodical.aggregate(periods, [], periodical.Sum(), assume_sorted=True)
+
+    def test_aggregate_sorted(self):
+        sources = collections.defaultdict(list)
+        for idx, data_point in enumerate(self.data_points):
+            sources[idx % 4].append(data_point)
+        sources = [iter(sorted(source, key=lambda pair: pair[0])) for source in sources.values()]
+        results = periodical.aggregate_sorted(self.periods, sources, periodical.Mean())
+        expected = periodical.average(self.periods, self.data_points)
+        self.assertEqual(list(results.keys()), list(expected.keys()))
+        for period in self.periods:
+            self.assertAlmostEqual(results[period], expected[period])
+        self.assertEqual(results.out_of_range, expected.out_of_range)
+
+
+class TestRollingWindows(unittest.TestCase):
+    def naive_rolling(self, results, window, func):
+        ret = []
+        for period in results:
+            values = [
+                value for other, value in results.items()
+                if 0 <= period.ordinal - other.ordinal < window and value is not None
+            ]
+            ret.append(func(values))
+        return ret
+
+    def test_matches_naive_windows(self):
+        rand = random.Random(0)
+        for periods in (
+            periodical.date_periods_ascending(datetime.date(2014, 1, 1), 'daily', 40),
+            periodical.date_periods_descending(datetime.date(2014, 1, 1), 'daily', 40),
+            periodical.time_periods_descending(periodical.utc_datetime(2014, 1, 1), 'hour', 50),
+        ):
+            results = collections.OrderedDict(
+                (period, None if rand.random() < 0.2 else rand.randint(-50, 50)) for period in periods
+            )
+            for window in (1, 3, 7, 24):
+                self.assertEqual(
+                    list(periodical.rolling_summation(results, window).values()),
+                    self.naive_rolling(results, window, sum)
+                )
+                self.assertEqual(
+                    list(periodical.rolling_count(results, window).values()),
+                    self.naive_rolling(results, window, len)
+                )
+                self.assertEqual(
+                    list(periodical.rolling_average(results, window).values()),
+                    self.naive_rolling(results, window, lambda values: float(sum(values)) / len(values) if values else None)
+                )
+                self.assertEqual(
+                    list(periodical.rolling_minimum(results, window).values()),
+                    self.naive_rolling(results, window, lambda values: min(values) if values else None)
+                )
+                self.assertEqual(
+                    list(periodical.rolling_maximum(results, window).values()),
+                    self.naive_rolling(results, window, lambda values: max(values) if values else None)
+                )
+
+    def test_seven_day_moving_average(self):
+        periods = periodical.date_periods_descending(datetime.date(2014, 1, 14), 'daily', 14)
+        data_points = [(period.start, idx) for idx, period in enumerate(reversed(periods))]
+        results = periodical.rolling_average(periodical.summation(periods, data_points), 7)
+        self.assertEqual(list(results.keys()), periods)
+        self.assertEqual(results[periodical.DatePeriod('2014-01-14')], 10.0)
+        self.assertEqual(results[periodical.DatePeriod('2014-01-01')], 0.0)
+
+    def test_gaps_and_errors(self):
+        results = collections.OrderedDict([
+            (periodical.DatePeriod('2014-01-01'), 1),
+            (periodical.DatePeriod('2014-01-05'), 2),
+        ])
+        self.assertEqual(list(periodical.rolling_summation(results, 3).values()), [1, 2])
+        self.assertEqual(list(periodical.rolling_summation(results, 5).values()), [1, 3])
+        with self.assertRaises(ValueError):
+            periodical.rolling_summation(results, 0)
+        results[periodical.DatePeriod('2014-02')] = 3
+        with self.assertRaises(ValueError):
+            periodical.rolling_summation(results, 3)
+
+
+class TestTimeWeighted(unittest.TestCase):
+    def setUp(self):
+        self.periods = periodical.time_periods_ascending(periodical.utc_datetime(2014, 1, 1, 0), 'hour', 4)
+        self.samples = [
+            (periodical.utc_datetime(2014, 1, 1, 1, 30), 20),
+            (periodical.utc_datetime(2014, 1, 1, 0, 15), 10),
+            (periodical.utc_datetime(2014, 1, 1, 2, 0), None),
+            (periodical.utc_datetime(2014, 1, 1, 2, 45), 40),
+        ]
+
+    def test_time_weighted_average(self):
+        results = periodical.time_weighted_average(self.periods, self.samples)
+        self.assertEqual(list(results.values()), [10.0, 15.0, 40.0, 40.0])
+
+    def test_matches_per_second_average(self):
+        rand = random.Random(0)
+        start = periodical.utc_datetime(2014, 1, 1)
+        samples = [(start + datetime.timedelta(seconds=rand.randrange(-600, 7200)), rand.randint(0, 100)) for idx in range(50)]
+        periods = periodical.time_periods_descending(start + datetime.timedelta(minutes=110), 'minutes', 120)
+        results = periodical.time_weighted_average(periods, samples)
+        self.assertEqual(list(results.keys()), periods)
+        for period in periods:
+            held = []
+            for second in range(60):
+                time = period.start + datetime.timedelta(seconds=second)
+                before = [(sample_time, value) for sample_time, value in samples if sample_time <= time]
+                if before:
+                    held.append(max(before, key=lambda pair: pair[0])[1])
+            if not held:
+                self.assertEqual(results[period], None)
+            else:
+                self.assertAlmostEqual(results[period], float(sum(held)) / len(held))
+
+    def test_resample(self):
+        self.assertEqual(list(periodical.resample(self.periods, self.samples).values()), [None, 10, None, 40])
+        self.assertEqual(
+            list(periodical.resample(self.periods, self.samples[:2], method='linear').values()),
+            [None, 10 + 10 * (45 / 75.0), 20, 20]
+        )
+        self.assertEqual(
+            list(periodical.resample(self.periods, self.samples, method='linear').values()),
+            [None, 10 + 10 * (45 / 75.0), None, 40]
+        )
+        with self.assertRaises(ValueError):
+            periodical.resample(self.periods, self.samples, method='nearest')
+
+
+class TestPeriodFrame(unittest.TestCase):
+    def setUp(self):
+        self.start = periodical.TimePeriod('2014-01-01T00:00+01:00')
+        self.periods = periodical.PeriodRange(self.start, self.start + 23)
+        self.data_points = random_data_points(self.start.start, 0, 86400 + 3600, 1000)
+
+    def test_matches_period_dict(self):
+        for periods in (self.periods, list(reversed(self.periods))):
+            for func in (periodical.summation, periodical.average):
+                expected = func(periods, self.data_points)
+                frame = func(periods, self.data_points, frame=True)
+                self.assertTrue(isinstance(frame, periodical.PeriodFrame))
+                self.assertEqual(frame.to_dict(), expected)
+                self.assertEqual(frame, expected)
+                self.assertEqual(list(frame), list(expected.keys()))
+                self.assertEqual(frame.out_of_range, expected.out_of_range)
+        times = [time for time, value in self.data_points]
+        self.assertEqual(periodical.count(self.periods, times, frame=True), periodical.count(self.periods, times))
+
+    def test_lookup(self):
+        frame = periodical.average(self.periods[:3], [(self.start.start, 10)], frame=True)
+        self.assertEqual(len(frame), 3)
+        self.assertEqual(frame.ordinals.typecode, 'q')
+        self.assertEqual(list(frame.ordinals), [period.ordinal for period in self.periods[:3]])
+        self.assertTrue(self.start in frame)
+        self.assertFalse(periodical.TimePeriod('2014-01-01T00:00Z') in frame)
+        self.assertFalse(periodical.TimePeriod('2014-01-01+01:00') in frame)
+        self.assertEqual(frame.get(self.start + 5, 'missing'), 'missing')
+        with self.assertRaises(KeyError):
+            frame[self.start + 5]
+        self.assertEqual(frame.values().count(None), 2)
+        self.assertEqual(memoryview(frame.data).format, 'd')
+
+    def test_duplicates_and_mixed_periods(self):
+        periods = [self.start, self.start + 1, self.start]
+        frame = periodical.summation(periods, self.data_points, frame=True)
+        self.assertEqual(frame, periodical.summation(periods, self.data_points))
+        self.assertEqual(len(frame), 2)
+        with self.assertRaises(ValueError):
+            periodical.summation([self.start, periodical.TimePeriod('2014-01-01+01:00')], self.data_points, frame=True)
+
+    def test_counts_are_integers(self):
+        times = [time for time, value in self.data_points]
+        frame = periodical.count(self.periods, times, frame=True)
+        self.assertEqual(frame.data.typecode, 'q')
+        self.assertTrue(all(isinstance(value, int) for value in frame.values()))
+        frame = periodical.aggregate(self.periods, self.data_points, periodical.DistinctCount(), frame=True)
+        self.assertEqual(frame.data.typecode, 'q')
+
+    def test_unsupported_reducers(self):
+        for reducer in (periodical.Describe(), periodical.Quantiles(), periodical.QuantileSketches(), periodical.DistinctSketches()):
+            with self.assertRaises(ValueError):
+                periodical.aggregate(self.periods, self.data_points, reducer, frame=True)
+
+        class Pairs(periodical.Reducer):
+            def init(self):
+                return ()
+
+            def add(self, accumulator, value):
+                return (value, value)
+
+        with self.assertRaises(ValueError):
+            periodical.aggregate(self.periods, self.data_points, Pairs(), frame=True)
+
+    @unittest.skipIf(numpy is None, 'numpy not installed')
+    def test_to_numpy(self):
+        frame = periodical.summation(self.periods, self.data_points, frame=True)
+        ordinals, values = frame.to_numpy()
+        self.assertEqual(list(ordinals), list(frame.ordinals))
+        values[0] = -1
+        self.assertEqual(frame[self.start], -1)
+        times = [time for time, value in self.data_points]
+        ordinals, values = periodical.count(self.periods, times, frame=True).to_numpy()
+        self.assertEqual(values.dtype, numpy.int64)
+
+
+class TestStreamingAggregator(unittest.TestCase):
+    def time(self, hour, minute=0):
+        return periodical.utc_datetime(2014, 1, 1, hour, minute)
+
+    def test_emits_closed_periods(self):
+        stream = periodical.StreamingAggregator('hour', periodical.Sum(), allowed_lateness=datetime.timedelta(minutes=10))
+        self.assertEqual(stream.add(self.time(0, 5), 1), [])
+        self.assertEqual(stream.add(self.time(1, 5), 2), [])
+        self.assertEqual(stream.add(self.time(0, 55), 3), [])
+        self.assertEqual(stream.open_periods, [periodical.TimePeriod('2014-01-01T00Z'), periodical.TimePeriod('2014-01-01T01Z')])
+        self.assertEqual(stream.add(self.time(1, 10), 4), [(periodical.TimePeriod('2014-01-01T00Z'), 4)])
+        self.assertEqual(stream.add(self.time(3, 30), 5), [(periodical.TimePeriod('2014-01-01T01Z'), 6)])
+        self.assertEqual(stream.advance(self.time(3, 59)), [])
+        self.assertEqual(stream.advance(self.time(3, 0)), [])
+        self.assertEqual(stream.advance(self.time(4, 0)), [(periodical.TimePeriod('2014-01-01T03Z'), 5)])
+        self.assertEqual(stream.flush(), [])
+        self.assertEqual(stream.open_periods, [])
+
+    def test_matches_batch_aggregation(self):
+        rand = random.Random(0)
+        start = periodical.utc_datetime(2014, 1, 1)
+        events = sorted(
+            (start + datetime.timedelta(seconds=rand.randrange(86400)), rand.randint(0, 100))
+            for idx in range(2000)
+        )
+        # Shuffle the events by up to five minutes.
+        events = [(time, value) for time, value in sorted(
+            events, key=lambda pair: pair[0] + datetime.timedelta(seconds=rand.randrange(300))
+        )]
+        stream = periodical.StreamingAggregator('minutes', periodical.Mean(), allowed_lateness=datetime.timedelta(minutes=5))
+        results = stream.add_many(events) + stream.flush()
+        self.assertEqual(stream.late_count, 0)
+        self.assertEqual(stream.open_periods, [])
+        expected = periodical.average([period for period, value in results], events)
+        self.assertEqual(collections.OrderedDict(results), expected)
+        self.assertEqual(expected.out_of_range, 0)
+
+    def test_late_events(self):
+        late_events = []
+        for late, expected in (('drop', None), (lambda time, value: late_events.append(value), [2])):
+            stream = periodical.StreamingAggregator('hour', periodical.Count(), late=late)
+            stream.add(self.time(0, 30), 1)
+            self.assertEqual(stream.add(self.time(1, 0), 1), [(periodical.TimePeriod('2014-01-01T00Z'), 1)])
+            self.assertEqual(stream.add(self.time(0, 45), 2), [])
+            self.assertEqual(stream.late_count, 1)
+        self.assertEqual(late_events, [2])
+
+        stream = periodical.StreamingAggregator('hour', periodical.Count(), late='raise')
+        stream.add(self.time(2), 1)
+        with self.assertRaises(ValueError):
+            stream.add(self.time(1), 1)
+        with self.assertRaises(ValueError):
+            periodical.StreamingAggregator('hour', periodical.Count(), late='keep')
+
+    def test_timezone(self):
+        tzinfo = periodical.Offset('+05:30')
+        stream = periodical.StreamingAggregator('day', periodical.Sum(), tzinfo=tzinfo)
+        stream.add(periodical.utc_datetime(2014, 1, 1, 18, 0), 1)
+        closed = stream.add(periodical.utc_datetime(2014, 1, 1, 18, 30), 2)
+        self.assertEqual(closed, [(periodical.TimePeriod('2014-01-01+05:30'), 1)])
+
+
+class TestAggregationCache(unittest.TestCase):
+    def setUp(self):
+        self.start = periodical.utc_datetime(2014, 1, 1)
+        self.data_points = random_data_points(self.start, 0, 86400 * 2, 2000)
+        self.fetches = []
+
+    def fetch(self, time_from, time_until):
+        self.fetches.append((time_from, time_until))
+        return [(time, value) for time, value in self.data_points if time_from <= time < time_until]
+
+    def test_sliding_window(self):
+        cache = periodical.AggregationCache(periodical.Mean())
+        for hour in range(24, 48):
+            now = self.start + datetime.timedelta(hours=hour, minutes=30)
+            periods = periodical.time_periods_descending(now, 'hour', 24)
+            results = cache.aggregate(periods, self.fetch, now=now)
+            self.assertEqual(results, periodical.average(periods, self.data_points))
+            self.assertEqual(list(results.keys()), periods)
+        info = cache.info()
+        # The first refresh computes all 24 periods, and each later refresh
+        # reuses 23 closed periods and recomputes the open and newest ones.
+        self.assertEqual(info.misses, 24 + (23 * 2))
+        self.assertEqual(info.hits, 23 * 22)
+        self.assertEqual(info.currsize, 23)
+        self.assertEqual(self.fetches[-1], (
+            self.start + datetime.timedelta(hours=46), self.start + datetime.timedelta(hours=48)
+        ))
+
+    def test_eviction_and_clear(self):
+        cache = periodical.AggregationCache(periodical.Sum())
+        now = self.start + datetime.timedelta(days=3)
+        periods = periodical.time_periods_ascending(self.start, 'hour', 10)
+        cache.aggregate(periods, self.data_points, now=now)
+        self.assertEqual(cache.info(), periodical.CacheInfo(0, 10, None, 10))
+        results = cache.aggregate(periods[5:], self.data_points, now=now)
+        self.assertEqual(results, periodical.summation(periods[5:], self.data_points))
+        self.assertEqual(cache.info(), periodical.CacheInfo(5, 10, None, 5))
+        self.assertEqual(results.out_of_range, 0)
+        cache.clear()
+        self.assertEqual(cache.info(), periodical.CacheInfo(0, 0, None, 0))
+
+    def test_out_of_range(self):
+        cache = periodical.AggregationCache(periodical.Sum())
+        now = self.start + datetime.timedelta(days=3)
+        periods = periodical.time_periods_ascending(self.start, 'hour', 10)
+        results = cache.aggregate(periods[:5], self.data_points, now=now)
+        self.assertEqual(results.out_of_range, periodical.summation(periods[:5], self.data_points).out_of_range)
+        results = cache.aggregate(periods, self.data_points, now=now)
+        self.assertEqual(results, periodical.summation(periods, self.data_points))
+        self.assertEqual(results.out_of_range, periodical.summation(periods, self.data_points).out_of_range)
+
+    def test_naive_now_with_aware_periods(self):
+        cache = periodical.AggregationCache(periodical.Count())
+        periods = periodical.time_periods_ascending(self.start, 'hour', 2)
+        cache.aggregate(periods, self.data_points, now=datetime.datetime(2014, 1, 1, 1, 30))
+        self.assertEqual(cache.info().currsize, 1)
+
+    def test_date_periods(self):
+        cache = periodical.AggregationCache(periodical.Count())
+        data_points = [(time.date(), value) for time, value in self.data_points]
+        periods = periodical.date_periods_ascending(datetime.date(2014, 1, 1), 'daily', 2)
+        cache.aggregate(periods, data_points, now=datetime.date(2014, 1, 2))
+        self.assertEqual(cache.info().currsize, 1)
+        cache.aggregate(periods, data_points)
+        self.assertEqual(cache.info().currsize, 2)
+
+
+class TestEpochTimestamps(unittest.TestCase):
+    def setUp(self):
+        rand = random.Random(0)
+        self.start = periodical.utc_datetime(2014, 1, 1)
+        self.epoch = datetime.datetime(1970, 1, 1, tzinfo=periodical.UTC())
+        self.seconds = [rand.uniform(0, 86400 * 70) + 1388534400 for idx in range(2000)]
+        self.data_points = [(self.epoch + datetime.timedelta(seconds=seconds), 1) for seconds in self.seconds]
+
+    def test_contains(self):
+        period = periodical.TimePeriod('2014-01-01T01Z')
+        self.assertTrue(period.contains(1388538000, unit='s'))
+        self.assertTrue(period.contains(1388541599.999, unit='s'))
+        self.assertFalse(period.contains(1388541600, unit='s'))
+        self.assertTrue(period.contains(1388538000000, unit='ms'))
+        self.assertTrue(periodical.TimePeriod('2014-01-01T02:00+01:00').contains(1388538000, unit='s'))
+        self.assertTrue(periodical.TimePeriod('2014-01-01T01').contains(1388538000 * 10 ** 9, unit='ns'))
+        self.assertTrue(periodical.DatePeriod('2014-01').contains(1391212799, unit='s'))
+        self.assertFalse(periodical.DatePeriod('2014-01').contains(1391212800, unit='s'))
+        with self.assertRaises(ValueError):
+            period.contains(1388538000, unit='minutes')
+
+    def test_matches_datetime_aggregation(self):
+        for span, tzinfo in (('hour', None), ('day', periodical.Offset('-05:00')), ('week', None), ('month', periodical.Offset('+05:30'))):
+            start = self.start if tzinfo is None else self.start.astimezone(tzinfo)
+            periods = periodical.time_periods_ascending(start, span, 10)
+            expected = periodical.summation(periods, self.data_points)
+            for unit, scale in (('s', 1), ('ms', 1000), ('us', 10 ** 6)):
+                epoch_points = [(seconds * scale, 1) for seconds in self.seconds]
+                results = periodical.summation(periods, epoch_points, unit=unit)
+                self.assertEqual(results, expected)
+                self.assertEqual(results.out_of_range, expected.out_of_range)
+            times = [time for time, value in self.data_points]
+            self.assertEqual(periodical.count(periods, self.seconds, unit='s'), periodical.count(periods, times))
+
+    def test_mixed_periods_and_map(self):
+        periods = [periodical.TimePeriod('2014-01-01T00Z'), periodical.DatePeriod('2014-01-02')]
+        results = periodical.map(periods, [(1388534400, 'a'), (1388620800 + 5, 'b'), (0, 'c')], unit='s')
+        self.assertEqual(list(results.values()), [['a'], ['b']])
+        self.assertEqual(results.out_of_range, 1)
+
+    def test_parallel(self):
+        periods = periodical.time_periods_ascending(self.start, 'day', 70)
+        epoch_points = [(int(seconds * 1000), 1) for seconds in self.seconds]
+        self.assertEqual(
+            periodical.summation(periods, epoch_points, workers=2, unit='ms'),
+            periodical.summation(periods, epoch_points, unit='ms')
+        )
+
+
+class TestFloorToSpan(unittest.TestCase):
+    spans = ('second', 'minute', 'hour', 'day', 'week', 'month', 'quarter', 'year')
+
+    def setUp(self):
+        rand = random.Random(0)
+        self.epoch = datetime.datetime(1970, 1, 1, tzinfo=periodical.UTC())
+        self.seconds = [rand.randrange(-10 ** 9, 2 * 10 ** 9) for idx in range(500)]
+        self.times = [self.epoch + datetime.timedelta(seconds=seconds) for seconds in self.seconds]
+
+    def epoch_seconds(self, time):
+        return int((time - self.epoch).total_seconds())
+
+    def test_matches_time_periods(self):
+        for tzinfo in (None, periodical.Offset('+05:30'), periodical.Offset('-08:00')):
+            times = [time.astimezone(tzinfo) if tzinfo else time for time in self.times]
+            for span in self.spans:
+                periods = [periodical.TimePeriod(time=time, span=span) for time in times]
+                ordinals = [period.ordinal for period in periods]
+                starts = [period.start for period in periods]
+                self.assertEqual(periodical.floor_to_span(times, span, ordinals=True), ordinals)
+                self.assertEqual(periodical.floor_to_span(self.times, span, tz=tzinfo or periodical.UTC()), starts)
+                self.assertEqual(periodical.floor_to_span(self.seconds, span, tz=tzinfo, unit='s', ordinals=True), ordinals)
+                self.assertEqual(
+                    periodical.floor_to_span([seconds * 1000 + 999 for seconds in self.seconds], span, tz=tzinfo, unit='ms'),
+                    [self.epoch_seconds(start) * 1000 for start in starts]
+                )
+
+    def test_dates(self):
+        dates = [time.date() for time in self.times]
+        for span in ('day', 'week', 'month', 'quarter', 'year'):
+            periods = [periodical.DatePeriod(date=date, span=span) for date in dates]
+            self.assertEqual(periodical.floor_to_span(dates, span), [period.start for period in periods])
+            self.assertEqual(periodical.floor_to_span(dates, span, ordinals=True), [period.ordinal for period in periods])
+        with self.assertRaises(ValueError):
+            periodical.floor_to_span(dates, 'hour')
+
+    def test_shared_start_times(self):
+        times = [periodical.utc_datetime(2014, 1, 1, 0, minute) for minute in range(60)]
+        starts = periodical.floor_to_span(times, 'hour')
+        self.assertEqual(len(set(id(start) for start in starts)), 1)
+
+    def test_errors(self):
+        self.assertEqual(periodical.floor_to_span([], 'hour'), [])
+        self.assertEqual(periodical.floor_to_span([], 'month', unit='s'), [])
+        with self.assertRaises(ValueError):
+            periodical.floor_to_span(self.seconds, 'hour', unit='h')
+
+        class Local(datetime.tzinfo):
+            def utcoffset(self, time):
+                return None if time is None else datetime.timedelta(hours=1)
+        with self.assertRaises(ValueError):
+            periodical.floor_to_span(self.seconds, 'hour', tz=Local(), unit='s')
+
+    @unittest.skipIf(numpy is None, 'numpy not installed')
+    def test_numpy(self):
+        tzinfo = periodical.Offset('+05:30')
+        times = [time.astimezone(tzinfo) for time in self.times]
+        array = numpy.array(self.seconds, dtype='datetime64[s]')
+        for span in self.spans:
+            periods = [periodical.TimePeriod(time=time, span=span) for time in times]
+            ordinals = periodical.floor_to_span(array, span, tz=tzinfo, ordinals=True)
+            self.assertEqual(ordinals.tolist(), [period.ordinal for period in periods])
+            starts = periodical.floor_to_span(array.astype('datetime64[ms]'), span, tz=tzinfo)
+            self.assertEqual(starts.dtype, numpy.dtype('datetime64[ms]'))
+            self.assertEqual(
+                starts.astype('datetime64[s]').astype('int64').tolist(),
+                [self.epoch_seconds(period.start) for period in periods]
+            )
+            epochs = numpy.array(self.seconds) * 1000
+            self.assertEqual(periodical.floor_to_span(epochs, span, tz=tzinfo, unit='ms', ordinals=True).tolist(), ordinals.tolist())
+
+    @unittest.skipIf(numpy is None, 'numpy not installed')
+    def test_numpy_nat(self):
+        array = numpy.array(['NaT', '2014-02-15T10:30', 'NaT'], dtype='datetime64[m]')
+        for span in ('hour', 'month', 'year'):
+            period = periodical.TimePeriod(time=periodical.utc_datetime(2014, 2, 15, 10, 30), span=span)
+            ordinals = periodical.floor_to_span(array, span, ordinals=True)
+            self.assertEqual(ordinals.tolist(), [-1, period.ordinal, -1])
+            starts = periodical.floor_to_span(array, span)
+            self.assertEqual(numpy.isnat(starts).tolist(), [True, False, True])
+            self.assertEqual(starts[1], numpy.datetime64(periodical._naive_utc(period.start), 'm'))
+        all_nat = numpy.array(['NaT', 'NaT'], dtype='datetime64[s]')
+        self.assertEqual(periodical.floor_to_span(all_nat, 'month', ordinals=True).tolist(), [-1, -1])
+        self.assertTrue(numpy.isnat(periodical.floor_to_span(all_nat, 'month')).all())
+
+
+@unittest.skipIf(numpy is None, 'numpy not installed')
+class TestNumpyAggregation(unittest.TestCase):
+    def setUp(self):
+        start = periodical.utc_datetime(2014, 9, 1)
+        self.periods = periodical.time_periods_descending(start, 'hour', 24)
+        self.data_points = random_data_points(start, -3600 * 24, (3600 * 2) + 1, 1000)
+        self.times = numpy.array([periodical._naive_utc(time) for time, value in self.data_points], dtype='datetime64[us]')
+        self.values = numpy.array([value for time, value in self.data_points])
+
+    def test_summation(self):
+        result = periodical.numpy_summation(self.periods, self.times, self.values)
+        expected = periodical.summation(self.periods, self.data_points)
+        self.assertEqual(result, expected)
+        self.assertEqual(result.out_of_range, expected.out_of_range)
+        self.assertTrue(all(isinstance(value, int) for value in result.values()))
+
+    def test_average(self):
+        result = periodical.numpy_average(self.periods, self.times, self.values)
+        expected = periodical.average(self.periods, self.data_points)
+        self.assertEqual(list(result), list(expected))
+        for period in expected:
+            self.assertAlmostEqual(result[period], expected[period])
+
+    def test_count(self):
+        result = periodical.numpy_count(self.periods, self.times)
+        expected = periodical.count(self.periods, [time for time, value in self.data_points])
+        self.assertEqual(result, expected)
+        self.assertEqual(result.out_of_range, expected.out_of_range)
+
+    def test_date_periods(self):
+        periods = periodical.date_periods_ascending(datetime.date(2014, 1, 1), 'monthly', 2)
+        times = numpy.array(['2014-01-31T23:59', '2014-02-01', '2014-03-01'], dtype='datetime64[m]')
+        result = periodical.numpy_summation(periods, times, numpy.array([1.5, 2.0, 3.0]), zero=0.0)
+        expected = collections.OrderedDict([
+            (periodical.DatePeriod('2014-01'), 1.5),
+            (periodical.DatePeriod('2014-02'), 2.0),
+        ])
+        self.assertEqual(result, expected)
+        self.assertEqual(result.out_of_range, 1)
+
+    def test_duplicate_periods(self):
+        periods = list(self.periods) + [self.periods[3], self.periods[0]]
+        times = [time for time, value in self.data_points]
+        self.assertEqual(
+            periodical.numpy_summation(periods, self.times, self.values),
+            periodical.summation(periods, self.data_points)
+        )
+        self.assertEqual(
+            periodical.numpy_average(periods, self.times, self.values),
+            periodical.average(periods, self.data_points)
+        )
+        self.assertEqual(
+            periodical.numpy_count(periods, self.times),
+            periodical.count(periods, times)
+        )
+
+
 if __name__ == '__main__':
     unittest.main()